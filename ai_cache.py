@@ -0,0 +1,33 @@
+import os
+import json
+import hashlib
+
+from db_cache import CacheTable
+
+# Bump when a prompt changes so results from the old prompt are not reused
+PROMPT_VERSION = 1
+
+AI_CACHE_MAX_BYTES = int(os.environ.get('AI_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+
+_table = CacheTable('ai_cache', 'result', AI_CACHE_MAX_BYTES)
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different copies of a text share a key"""
+    return ' '.join(text.split())
+
+def cache_key(text, action, count, model_name):
+    payload = json.dumps(
+        [PROMPT_VERSION, model_name, action, count, normalize_text(text)],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def get_cached_result(key):
+    """Return the stored result for key, or None on a miss"""
+    result = _table.get(key)
+    return None if result is None else json.loads(result)
+
+def store_result(key, action, result):
+    """Store a successful result, evicting least recently used entries over the size cap"""
+    encoded = json.dumps(result, ensure_ascii=False)
+    _table.put(key, encoded, len(encoded.encode('utf-8')), action=action)
@@ -0,0 +1,66 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+
+# Number of distinct (API key, model) clients kept open
+AI_CLIENT_CACHE_SIZE = int(os.environ.get('AI_CLIENT_CACHE_SIZE', 32))
+
+def _key_hash(api_key):
+    # Keys are only held by the clients themselves, never as dict keys
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+class ClientRegistry:
+    """
+    Thread-safe LRU cache of Gemini models, one per (API key, model name)
+
+    genai.configure() swaps a process-wide default client, which races when
+    requests with different keys run concurrently. Each model built here
+    gets its own client bound to one key instead, and keeps it (and its
+    connection) for reuse by later requests with the same key.
+    """
+
+    def __init__(self, max_clients=AI_CLIENT_CACHE_SIZE):
+        self.max_clients = max_clients
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, api_key, model_name):
+        key = (_key_hash(api_key), model_name)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+
+        # Build outside the lock; if two threads race, the first one stored wins
+        model = self._build(api_key, model_name)
+
+        with self._lock:
+            existing = self._models.get(key)
+            if existing is not None:
+                self._models.move_to_end(key)
+                return existing
+            self._models[key] = model
+            while len(self._models) > self.max_clients:
+                self._models.popitem(last=False)
+        return model
+
+    def _build(self, api_key, model_name):
+        model = genai.GenerativeModel(model_name)
+        # GenerativeModel only creates its client lazily from the global
+        # configuration, so give it one bound to this key up front
+        model._client = glm.GenerativeServiceClient(client_options={'api_key': api_key})
+        return model
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+registry = ClientRegistry()
+
+def get_model(api_key, model_name):
+    """Return a cached model that sends requests with api_key"""
+    return registry.get(api_key, model_name)
@@ -0,0 +1,302 @@
+import os
+import time
+import random
+import threading
+from collections import OrderedDict
+
+# Sustained model calls allowed per API key, and the burst above that
+AI_RATE_PER_MINUTE = float(os.environ.get('AI_RATE_PER_MINUTE', 60))
+AI_RATE_BURST = int(os.environ.get('AI_RATE_BURST', 10))
+# Model calls in flight at once across all keys
+AI_MAX_INFLIGHT = int(os.environ.get('AI_MAX_INFLIGHT', 8))
+# Longest a call may wait for a rate limit token or a free slot
+AI_MAX_QUEUE_SECONDS = float(os.environ.get('AI_MAX_QUEUE_SECONDS', 10))
+# Total time budget for one call, including retries
+AI_REQUEST_TIMEOUT = float(os.environ.get('AI_REQUEST_TIMEOUT', 60))
+AI_MAX_RETRIES = int(os.environ.get('AI_MAX_RETRIES', 3))
+AI_RETRY_BASE_DELAY = float(os.environ.get('AI_RETRY_BASE_DELAY', 0.5))
+AI_RETRY_MAX_DELAY = float(os.environ.get('AI_RETRY_MAX_DELAY', 8))
+# Consecutive outage errors that open the circuit, and how long it stays open
+AI_BREAKER_THRESHOLD = int(os.environ.get('AI_BREAKER_THRESHOLD', 5))
+AI_BREAKER_COOLDOWN = float(os.environ.get('AI_BREAKER_COOLDOWN', 30))
+
+class AdmissionError(Exception):
+    """A model call was refused before it was sent"""
+
+class RateLimitedError(AdmissionError):
+    pass
+
+class CircuitOpenError(AdmissionError):
+    pass
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `capacity`; not thread-safe on its own"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        """Take a token, returning how long the caller must wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+class CircuitBreaker:
+    """
+    Fail fast after repeated outage errors
+
+    The circuit opens after `threshold` consecutive failures. Once `cooldown`
+    seconds have passed a single trial call is let through; its success
+    closes the circuit and its failure opens it again.
+    """
+
+    def __init__(self, threshold=AI_BREAKER_THRESHOLD, cooldown=AI_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                return 'half-open'
+            return 'open'
+
+    def before_call(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_running:
+                raise CircuitOpenError('AI service is temporarily unavailable, please try again shortly')
+            self.trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def record_neutral(self):
+        """A call finished without telling us anything about service health"""
+        with self._lock:
+            self.trial_running = False
+
+class AdmissionController:
+    """
+    Shared gate in front of every model call
+
+    Each call takes a token from its API key's bucket, then one of a fixed
+    number of in-flight slots, waiting at most max_queue_seconds for either.
+    Retryable errors are retried with full-jitter exponential backoff until
+    max_retries or the call's deadline; outage errors also feed the circuit
+    breaker. Calls are made as fn(timeout) so each attempt can pass the time
+    left before the deadline to the client.
+    """
+
+    def __init__(self, rate_per_minute=AI_RATE_PER_MINUTE, burst=AI_RATE_BURST,
+                 max_inflight=AI_MAX_INFLIGHT, max_queue_seconds=AI_MAX_QUEUE_SECONDS,
+                 timeout=AI_REQUEST_TIMEOUT, max_retries=AI_MAX_RETRIES,
+                 base_delay=AI_RETRY_BASE_DELAY, max_delay=AI_RETRY_MAX_DELAY,
+                 breaker=None, is_retryable=None, is_outage=None, max_buckets=1024):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_queue_seconds = max_queue_seconds
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.is_retryable = is_retryable or (lambda e: isinstance(e, (TimeoutError, ConnectionError)))
+        self.is_outage = is_outage or self.is_retryable
+        self.max_buckets = max_buckets
+        self._buckets = OrderedDict()
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+        self._metrics = {
+            'calls': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'retries': 0,
+            'rejected_rate_limit': 0,
+            'rejected_busy': 0,
+            'rejected_circuit_open': 0,
+            'in_flight': 0,
+            'queue_wait_total': 0.0,
+            'queue_wait_max': 0.0,
+        }
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        admitted = metrics['succeeded'] + metrics['failed'] + metrics['in_flight']
+        metrics['queue_wait_avg'] = metrics['queue_wait_total'] / admitted if admitted else 0.0
+        metrics['circuit'] = self.breaker.state
+        return metrics
+
+    def _acquire(self, key, deadline):
+        """Wait for a rate limit token and a slot, returning the time spent waiting"""
+        started = time.monotonic()
+        budget = min(self.max_queue_seconds, deadline - started)
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+                while len(self._buckets) > self.max_buckets:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.reserve()
+            if wait > budget:
+                bucket.refund()
+                self._metrics['rejected_rate_limit'] += 1
+                raise RateLimitedError('Too many AI requests, please try again shortly')
+
+        if wait:
+            time.sleep(wait)
+
+        remaining = budget - (time.monotonic() - started)
+        if not self._slots.acquire(timeout=max(0.0, remaining)):
+            self._count('rejected_busy')
+            raise RateLimitedError('AI service is busy, please try again shortly')
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._metrics['in_flight'] += 1
+            self._metrics['queue_wait_total'] += waited
+            self._metrics['queue_wait_max'] = max(self._metrics['queue_wait_max'], waited)
+        return waited
+
+    def _release(self):
+        with self._lock:
+            self._metrics['in_flight'] -= 1
+        self._slots.release()
+
+    def _before_call(self):
+        self._count('calls')
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self._count('rejected_circuit_open')
+            raise
+
+    def _backoff(self, attempt, deadline):
+        """Sleep before the next attempt, or return False if it would pass the deadline"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return False
+        self._count('retries')
+        time.sleep(delay)
+        return True
+
+    def _handle_failure(self, e, attempt, deadline):
+        """Record a failed attempt and decide whether to retry it"""
+        if self.is_outage(e):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_neutral()
+        if (not self.is_retryable(e) or attempt >= self.max_retries
+                or not self._backoff(attempt, deadline)):
+            self._count('failed')
+            return False
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            # This failure opened the circuit; report it rather than the breaker
+            self._count('failed')
+            return False
+        return True
+
+    def call(self, key, fn, timeout=None):
+        """Run fn(timeout) under the rate limit, concurrency cap, retries and breaker"""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._before_call()
+
+        attempt = 0
+        while True:
+            try:
+                self._acquire(key, deadline)
+            except AdmissionError:
+                self.breaker.record_neutral()
+                raise
+            try:
+                result = fn(max(0.0, deadline - time.monotonic()))
+            except Exception as e:
+                self._release()
+                if not self._handle_failure(e, attempt, deadline):
+                    raise
+                attempt += 1
+                continue
+            self._release()
+            self.breaker.record_success()
+            self._count('succeeded')
+            return result
+
+    def stream(self, key, fn, timeout=None):
+        """
+        Like call(), for fn(timeout) returning an iterator
+
+        The slot is held until the iterator is exhausted or closed. Attempts
+        are only retried if they fail before producing their first item.
+        """
+        deadline = time.monotonic() + (timeout or self.timeout)
+        self._before_call()
+
+        attempt = 0
+        while True:
+            try:
+                self._acquire(key, deadline)
+            except AdmissionError:
+                self.breaker.record_neutral()
+                raise
+            produced = False
+            try:
+                for item in fn(max(0.0, deadline - time.monotonic())):
+                    produced = True
+                    yield item
+            except GeneratorExit:
+                self._release()
+                # Consumers close the stream once they have what they need;
+                # the backend worked if it produced anything
+                if produced:
+                    self.breaker.record_success()
+                    self._count('succeeded')
+                else:
+                    self.breaker.record_neutral()
+                raise
+            except Exception as e:
+                self._release()
+                if produced or not self._handle_failure(e, attempt, deadline):
+                    if produced:
+                        self._handle_failure(e, self.max_retries, deadline)
+                    raise
+                attempt += 1
+                continue
+            self._release()
+            self.breaker.record_success()
+            self._count('succeeded')
+            return
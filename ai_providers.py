@@ -0,0 +1,190 @@
+import re
+import hashlib
+from collections import Counter
+
+class Provider:
+    """
+    Base class for content generation backends
+
+    Subclasses implement summary(), flashcards() and questions() for one
+    piece of text. The stream_* methods default to yielding the complete
+    result; override them when the backend can produce output incrementally.
+    model_name is part of the AI cache key, so bump it whenever a change
+    would alter the generated output.
+    """
+
+    name = None
+    model_name = None
+
+    def summary(self, text, max_words):
+        raise NotImplementedError
+
+    def flashcards(self, text, num_cards):
+        raise NotImplementedError
+
+    def questions(self, text, num_questions):
+        raise NotImplementedError
+
+    def stream_summary(self, text, max_words):
+        yield self.summary(text, max_words)
+
+    def stream_flashcards(self, text, num_cards):
+        yield from self.flashcards(text, num_cards)
+
+    def stream_questions(self, text, num_questions):
+        yield from self.questions(text, num_questions)
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because
+been before being below between both but by can could did do does doing down
+during each either etc even ever every few for from further had has have having
+he her here hers herself him himself his how however i if in into is it its
+itself just least less let like made make many may me might more most much must
+my myself neither no nor not now of off often on once one only or other our
+ours ourselves out over own per rather same several she should since so some
+such than that the their theirs them themselves then there these they this
+those though through thus to too two under until up upon us used using very via
+was we were what when where whether which while who whom whose why will with
+within without would yet you your yours yourself yourselves
+""".split())
+
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(])')
+WORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]*[A-Za-z]")
+# "X is a Y", "X are Y", "X refers to Y" at the start of a sentence
+DEFINITION_RE = re.compile(
+    r"^(?P<term>[A-Z][\w'-]*(?:\s+[\w'-]+){0,5}?)\s+"
+    r"(?P<verb>is|are|was|were|refers to|means|describes)\s+"
+    r"(?P<rest>.{10,})$"
+)
+
+MIN_SENTENCE_WORDS = 6
+MAX_SENTENCE_WORDS = 60
+
+def split_sentences(text):
+    sentences = []
+    for paragraph in text.splitlines():
+        for sentence in SENTENCE_RE.split(paragraph.strip()):
+            sentence = sentence.strip()
+            if MIN_SENTENCE_WORDS <= len(sentence.split()) <= MAX_SENTENCE_WORDS:
+                sentences.append(sentence)
+    return sentences
+
+def content_words(sentence):
+    return [w for w in (m.group(0).lower() for m in WORD_RE.finditer(sentence))
+            if w not in STOPWORDS and len(w) > 2]
+
+def _stable_order(items, seed):
+    """Shuffle deterministically so repeated runs give identical output"""
+    return sorted(items, key=lambda item: hashlib.md5(f'{seed}|{item}'.encode('utf-8')).hexdigest())
+
+class LocalProvider(Provider):
+    """
+    Deterministic offline backend built on extractive heuristics
+
+    Sentences are scored by the document frequency of their content words.
+    Summaries keep the best sentences in document order; flashcards turn
+    definitional sentences into "What is X?" questions and others into
+    cloze deletions of their most important word; multiple choice questions
+    use cloze deletions with other key terms from the text as distractors.
+    No network access is needed, which makes it suitable for load tests and
+    as a fallback when the remote model is unavailable.
+    """
+
+    name = 'local'
+    model_name = 'local-extractive-1'
+
+    def _rank(self, text):
+        """Return [(score, index, sentence, words)] best first, and word frequencies"""
+        # Repeated sentences would only produce duplicate cards
+        sentences = list(dict.fromkeys(split_sentences(text)))
+        words = [content_words(s) for s in sentences]
+        freq = Counter(w for ws in words for w in set(ws))
+        ranked = []
+        for index, (sentence, ws) in enumerate(zip(sentences, words)):
+            if not ws:
+                continue
+            score = sum(freq[w] for w in set(ws)) / len(ws) ** 0.5
+            # Slight preference for earlier sentences, which tend to introduce topics
+            score *= 1 + 0.5 / (1 + index)
+            ranked.append((score, index, sentence, ws))
+        ranked.sort(key=lambda r: (-r[0], r[1]))
+        return ranked, freq
+
+    def summary(self, text, max_words):
+        ranked, _ = self._rank(text)
+        chosen = []
+        total = 0
+        for _, index, sentence, _ in ranked:
+            length = len(sentence.split())
+            if chosen and total + length > max_words:
+                continue
+            chosen.append((index, sentence))
+            total += length
+            if total >= max_words:
+                break
+        if not chosen:
+            return text.strip()
+        chosen.sort()
+        sentences = [sentence for _, sentence in chosen]
+        paragraphs = [' '.join(sentences[i:i + 3]) for i in range(0, len(sentences), 3)]
+        return '\n\n'.join(paragraphs)
+
+    def _key_term(self, words, freq):
+        """The most frequent content word in a sentence, longest first on ties"""
+        return max(words, key=lambda w: (freq[w], len(w), w))
+
+    def _cloze(self, sentence, term):
+        pattern = re.compile(r'\b' + re.escape(term) + r'\b', re.IGNORECASE)
+        match = pattern.search(sentence)
+        if not match:
+            return None, None
+        return pattern.sub('_____', sentence, count=1), match.group(0)
+
+    def flashcards(self, text, num_cards):
+        ranked, freq = self._rank(text)
+        cards = []
+        for _, _, sentence, words in ranked:
+            if len(cards) >= num_cards:
+                break
+            definition = DEFINITION_RE.match(sentence)
+            if definition:
+                verb = definition.group('verb')
+                question_verb = verb if verb in ('is', 'are', 'was', 'were') else 'is'
+                cards.append({
+                    'question': f"What {question_verb} {definition.group('term')}?",
+                    'answer': sentence
+                })
+                continue
+            blanked, answer = self._cloze(sentence, self._key_term(words, freq))
+            if blanked:
+                cards.append({
+                    'question': f'Fill in the blank: {blanked}',
+                    'answer': answer
+                })
+        return cards
+
+    def questions(self, text, num_questions):
+        ranked, freq = self._rank(text)
+        vocabulary = sorted(freq, key=lambda w: (-freq[w], w))
+        questions = []
+        for _, index, sentence, words in ranked:
+            if len(questions) >= num_questions:
+                break
+            term = self._key_term(words, freq)
+            blanked, answer = self._cloze(sentence, term)
+            if not blanked:
+                continue
+            in_sentence = set(words)
+            # Prefer distractors of similar importance that don't appear in the sentence
+            candidates = [w for w in vocabulary if w not in in_sentence]
+            candidates.sort(key=lambda w: (abs(freq[w] - freq[term]), abs(len(w) - len(term)), w))
+            distractors = candidates[:3]
+            if not distractors:
+                continue
+            choices = _stable_order([answer] + distractors, f'{index}|{sentence}')
+            questions.append({
+                'question': f'Which word best completes the statement? {blanked}',
+                'choices': choices,
+                'answer': answer
+            })
+        return questions
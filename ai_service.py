@@ -1,31 +1,165 @@
 import re
 import os
-import google.generativeai as genai
+import json
+import queue
+import hashlib
+import threading
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from google.api_core import exceptions as google_exceptions
+
+from ai_cache import cache_key, get_cached_result, store_result
+from ai_clients import get_model
+from ai_providers import Provider, LocalProvider
+from ai_limits import AdmissionController, AdmissionError
+
+MODEL_NAME = 'gemini-2.0-flash'
 
 # Configure Gemini API
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
 
 if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    model = genai.GenerativeModel('gemini-2.0-flash')
+    model = get_model(GEMINI_API_KEY, MODEL_NAME)
 else:
     model = None
 
-def generate_summary(text, max_words=200, user_api_key=None):
-    """Generate a concise summary using Gemini API"""
-    current_model = model
-    
-    if user_api_key:
+# Generation backend: 'gemini', or 'local' for the offline heuristic backend
+AI_PROVIDER = os.environ.get('AI_PROVIDER', 'gemini')
+# Backend used when Gemini is rate limited, unavailable or too slow:
+# 'local', or 'none' to report the error instead
+AI_FALLBACK = os.environ.get('AI_FALLBACK', 'local')
+
+# Texts longer than this are split and generated chunk by chunk in parallel
+AI_CHUNK_CHARS = int(os.environ.get('AI_CHUNK_CHARS', 12000))
+# Upper bound on concurrent model calls for one document
+AI_MAX_CONCURRENCY = int(os.environ.get('AI_MAX_CONCURRENCY', 4))
+# Don't spread a small request so thin that each chunk asks for one item
+MIN_ITEMS_PER_CHUNK = 3
+
+def split_into_chunks(text, max_chars=AI_CHUNK_CHARS):
+    """
+    Split text into chunks of at most max_chars, breaking on paragraph
+    (line) boundaries, then sentence boundaries for oversized paragraphs
+    """
+    pieces = []
+    for paragraph in text.split('\n'):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        sentence = ''
+        for part in re.split(r'(?<=[.!?])\s+', paragraph):
+            while len(part) > max_chars:
+                if sentence:
+                    pieces.append(sentence)
+                    sentence = ''
+                pieces.append(part[:max_chars])
+                part = part[max_chars:]
+            if sentence and len(sentence) + 1 + len(part) > max_chars:
+                pieces.append(sentence)
+                sentence = part
+            else:
+                sentence = f"{sentence} {part}" if sentence else part
+        if sentence:
+            pieces.append(sentence)
+
+    chunks = []
+    current = ''
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def distribute_count(total, weights):
+    """Split total across weights proportionally (largest remainder method)"""
+    weight_sum = sum(weights)
+    if not weight_sum:
+        return [0] * len(weights)
+    shares = [total * w / weight_sum for w in weights]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(len(weights)), key=lambda i: shares[i] - counts[i], reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+def _dedupe_key(item):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(item.get('question', '')).lower()).split())
+
+def plan_chunks(text, count, max_chars=AI_CHUNK_CHARS):
+    """Return (chunk_text, chunk_count) pairs covering text for `count` items"""
+    if len(text) <= max_chars:
+        return [(text, count)]
+
+    chunks = split_into_chunks(text, max_chars)
+
+    # Sample chunks evenly across the document when there are more chunks
+    # than the requested count can usefully cover
+    max_chunks = max(1, count // MIN_ITEMS_PER_CHUNK)
+    if len(chunks) > max_chunks:
+        step = len(chunks) / max_chunks
+        chunks = [chunks[int(i * step)] for i in range(max_chunks)]
+
+    counts = distribute_count(count, [len(chunk) for chunk in chunks])
+    return [(chunk, n) for chunk, n in zip(chunks, counts) if n > 0]
+
+def map_reduce_generate(text, count, generate_chunk, max_chars=AI_CHUNK_CHARS,
+                        max_workers=AI_MAX_CONCURRENCY):
+    """
+    Generate `count` items from text, fanning long texts out over chunks
+
+    generate_chunk(chunk_text, chunk_count) is called concurrently for each
+    chunk and must return a list of dicts with a 'question'. Results are
+    merged in document order with duplicate questions removed. Failed chunks
+    are dropped unless every chunk fails.
+
+    Returns (items, complete), where complete is False if any chunk failed
+    and the items therefore don't cover the whole text.
+    """
+    if len(text) <= max_chars:
+        return generate_chunk(text, count), True
+
+    jobs = plan_chunks(text, count, max_chars)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+        futures = [executor.submit(generate_chunk, chunk, n) for chunk, n in jobs]
+
+    results = []
+    errors = []
+    for future in futures:
         try:
-            genai.configure(api_key=user_api_key)
-            current_model = genai.GenerativeModel('gemini-2.0-flash')
+            results.append(future.result())
         except Exception as e:
-            return f"Error with provided API key: {str(e)}"
-    elif not model:
-        return "Please configure your Gemini API key in Settings to use AI generation."
+            errors.append(e)
+    if not results:
+        raise errors[0]
+
+    merged = []
+    seen = set()
+    for items in results:
+        for item in items:
+            key = _dedupe_key(item)
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(item)
+    return merged[:count], not errors
+
+def _format_summary(summary):
+    summary = summary.strip()
+    
+    # Ensure proper paragraph formatting
+    # Replace single newlines with double newlines for better spacing
+    summary = re.sub(r'\n(?!\n)', '\n\n', summary)
+    # Remove any triple or more newlines
+    summary = re.sub(r'\n{3,}', '\n\n', summary)
+    return summary
 
-    try:
-        prompt = f"""You are an expert content summarizer. Create a well-structured, professional summary of the following text in approximately {max_words} words.
+def _summary_prompt(text, max_words):
+    return f"""You are an expert content summarizer. Create a well-structured, professional summary of the following text in approximately {max_words} words.
 
 Requirements:
 - Organize the summary into clear, logical paragraphs (2-4 paragraphs recommended)
@@ -41,46 +175,30 @@ Text:
 
 Provide a well-formatted summary with clear paragraph breaks:"""
 
-        response = current_model.generate_content(prompt)
-        
-        if GEMINI_API_KEY and user_api_key:
-            genai.configure(api_key=GEMINI_API_KEY)
-        
-        summary = response.text.strip()
-        
-        # Ensure proper paragraph formatting
-        # Replace single newlines with double newlines for better spacing
-        summary = re.sub(r'\n(?!\n)', '\n\n', summary)
-        # Remove any triple or more newlines
-        summary = re.sub(r'\n{3,}', '\n\n', summary)
-        
-        return summary
-    except Exception as e:
-        if GEMINI_API_KEY and user_api_key:
-            genai.configure(api_key=GEMINI_API_KEY)
-        return f"Error generating summary: {str(e)}"
-
-def generate_flashcards(text, num_cards=10, user_api_key=None):
-    """Generate question-answer flashcards using Gemini API"""
-    current_model = model
+def generate_summary(text, max_words=200, user_api_key=None):
+    """Generate a concise summary with the configured backend"""
+    key = cache_key(text, 'summary', max_words, provider_model_name())
+    cached = get_cached_result(key)
+    if cached is not None:
+        return cached
     
-    if user_api_key:
-        try:
-            genai.configure(api_key=user_api_key)
-            current_model = genai.GenerativeModel('gemini-2.0-flash')
-        except Exception as e:
-            return [{
-                'question': 'API Key Error',
-                'answer': f'Error with provided API key: {str(e)}'
-            }]
-    elif not model:
-        return [{
-            'question': 'API Key Required',
-            'answer': 'Please configure your Gemini API key in Settings to use AI generation.'
-        }]
+    try:
+        provider = get_provider(user_api_key)
+    except Exception as e:
+        return f"Error with provided API key: {str(e)}"
+    if provider is None:
+        return "Please configure your Gemini API key in Settings to use AI generation."
 
     try:
-        prompt = f"""You are an expert educational content creator. Generate {num_cards} professional, high-quality flashcards from the following text.
+        return generate_with_fallback(
+            provider, text, 'summary', max_words,
+            lambda p: (_format_summary(p.summary(text, max_words)), True)
+        )
+    except Exception as e:
+        return f"Error generating summary: {str(e)}"
+
+def _flashcards_prompt(text, num_cards):
+    return f"""You are an expert educational content creator. Generate {num_cards} professional, high-quality flashcards from the following text.
 
 Requirements:
 - Each question should be clear, specific, and test understanding of key concepts
@@ -101,62 +219,66 @@ Return the flashcards in the following JSON format:
 
 Generate exactly {num_cards} flashcards. Make each question thought-provoking and each answer informative."""
 
-        response = current_model.generate_content(prompt)
-        result_text = response.text.strip()
+def _is_valid_flashcard(card):
+    return isinstance(card, dict) and 'question' in card and 'answer' in card
 
-        # Extract JSON from response (remove markdown code blocks if present)
-        if '```json' in result_text:
-            result_text = result_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in result_text:
-            result_text = result_text.split('```')[1].split('```')[0].strip()
+def _parse_flashcards(result_text, num_cards):
+    """Parse the model's flashcards for one piece of text, raising on bad output"""
+    result_text = result_text.strip()
 
-        import json
-        flashcards = json.loads(result_text)
+    # Extract JSON from response (remove markdown code blocks if present)
+    if '```json' in result_text:
+        result_text = result_text.split('```json')[1].split('```')[0].strip()
+    elif '```' in result_text:
+        result_text = result_text.split('```')[1].split('```')[0].strip()
 
-        # Validate structure
-        if not isinstance(flashcards, list):
-            raise ValueError("Invalid response format")
+    flashcards = json.loads(result_text)
 
-        for card in flashcards:
-            if not isinstance(card, dict) or 'question' not in card or 'answer' not in card:
-                raise ValueError("Invalid flashcard format")
+    # Validate structure
+    if not isinstance(flashcards, list):
+        raise ValueError("Invalid response format")
 
-        if GEMINI_API_KEY and user_api_key:
-            genai.configure(api_key=GEMINI_API_KEY)
-        
-        return flashcards[:num_cards]
+    for card in flashcards:
+        if not _is_valid_flashcard(card):
+            raise ValueError("Invalid flashcard format")
 
+    return flashcards[:num_cards]
+
+def generate_flashcards(text, num_cards=10, user_api_key=None):
+    """Generate question-answer flashcards with the configured backend"""
+    key = cache_key(text, 'flashcards', num_cards, provider_model_name())
+    cached = get_cached_result(key)
+    if cached is not None:
+        return cached
+    
+    try:
+        provider = get_provider(user_api_key)
     except Exception as e:
-        if GEMINI_API_KEY and user_api_key:
-            genai.configure(api_key=GEMINI_API_KEY)
         return [{
-            'question': 'Error generating flashcards',
-            'answer': f'Please try again. Error: {str(e)}'
+            'question': 'API Key Error',
+            'answer': f'Error with provided API key: {str(e)}'
         }]
-
-def generate_multiple_choice(text, num_questions=5, user_api_key=None):
-    """Generate multiple choice questions using Gemini API"""
-    current_model = model
-    
-    if user_api_key:
-        try:
-            genai.configure(api_key=user_api_key)
-            current_model = genai.GenerativeModel('gemini-2.0-flash')
-        except Exception as e:
-            return [{
-                'question': 'API Key Error',
-                'choices': ['Check your API key', 'In Settings', 'Try again', 'Visit Google AI Studio'],
-                'answer': 'Check your API key'
-            }]
-    elif not model:
+    if provider is None:
         return [{
             'question': 'API Key Required',
-            'choices': ['Go to Settings', 'Add your Gemini API key', 'Get free key from Google', 'Try again'],
-            'answer': 'Go to Settings'
+            'answer': 'Please configure your Gemini API key in Settings to use AI generation.'
         }]
 
+    def generate(p):
+        flashcards, complete = map_reduce_generate(text, num_cards, p.flashcards)
+        return flashcards[:num_cards], complete
+
     try:
-        prompt = f"""You are an expert educational assessment designer. Create {num_questions} professional, high-quality multiple choice questions from the following text.
+        return generate_with_fallback(provider, text, 'flashcards', num_cards, generate)
+
+    except Exception as e:
+        return [{
+            'question': 'Error generating flashcards',
+            'answer': f'Please try again. Error: {str(e)}'
+        }]
+
+def _questions_prompt(text, num_questions):
+    return f"""You are an expert educational assessment designer. Create {num_questions} professional, high-quality multiple choice questions from the following text.
 
 Requirements:
 - Each question should test comprehension and critical thinking
@@ -187,38 +309,456 @@ Return the questions in the following JSON format:
 
 Generate exactly {num_questions} questions. Ensure all choices are substantive and the correct answer is one of the four choices provided."""
 
-        response = current_model.generate_content(prompt)
-        result_text = response.text.strip()
+def _validate_question(q):
+    if not isinstance(q, dict) or 'question' not in q or 'choices' not in q or 'answer' not in q:
+        raise ValueError("Invalid question format")
+    if not isinstance(q['choices'], list) or len(q['choices']) < 2:
+        raise ValueError("Invalid choices format")
 
-        # Extract JSON from response
-        if '```json' in result_text:
-            result_text = result_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in result_text:
-            result_text = result_text.split('```')[1].split('```')[0].strip()
+def _parse_questions(result_text, num_questions):
+    """Parse the model's multiple choice questions for one piece of text, raising on bad output"""
+    result_text = result_text.strip()
 
-        import json
-        questions = json.loads(result_text)
+    # Extract JSON from response
+    if '```json' in result_text:
+        result_text = result_text.split('```json')[1].split('```')[0].strip()
+    elif '```' in result_text:
+        result_text = result_text.split('```')[1].split('```')[0].strip()
 
-        # Validate structure
-        if not isinstance(questions, list):
-            raise ValueError("Invalid response format")
+    questions = json.loads(result_text)
+
+    # Validate structure
+    if not isinstance(questions, list):
+        raise ValueError("Invalid response format")
+
+    for q in questions:
+        _validate_question(q)
+
+    return questions[:num_questions]
+
+def generate_multiple_choice(text, num_questions=5, user_api_key=None):
+    """Generate multiple choice questions with the configured backend"""
+    key = cache_key(text, 'multiple_choice', num_questions, provider_model_name())
+    cached = get_cached_result(key)
+    if cached is not None:
+        return cached
+    
+    try:
+        provider = get_provider(user_api_key)
+    except Exception as e:
+        return [{
+            'question': 'API Key Error',
+            'choices': ['Check your API key', 'In Settings', 'Try again', 'Visit Google AI Studio'],
+            'answer': 'Check your API key'
+        }]
+    if provider is None:
+        return [{
+            'question': 'API Key Required',
+            'choices': ['Go to Settings', 'Add your Gemini API key', 'Get free key from Google', 'Try again'],
+            'answer': 'Go to Settings'
+        }]
 
-        for q in questions:
-            if not isinstance(q, dict) or 'question' not in q or 'choices' not in q or 'answer' not in q:
-                raise ValueError("Invalid question format")
-            if not isinstance(q['choices'], list) or len(q['choices']) < 2:
-                raise ValueError("Invalid choices format")
+    def generate(p):
+        questions, complete = map_reduce_generate(text, num_questions, p.questions)
+        return questions[:num_questions], complete
 
-        if GEMINI_API_KEY and user_api_key:
-            genai.configure(api_key=GEMINI_API_KEY)
-        
-        return questions[:num_questions]
+    try:
+        return generate_with_fallback(provider, text, 'multiple_choice', num_questions, generate)
 
     except Exception as e:
-        if GEMINI_API_KEY and user_api_key:
-            genai.configure(api_key=GEMINI_API_KEY)
         return [{
             'question': 'Error generating questions',
             'choices': ['Try again', 'Check API key', 'Verify text input', 'Visit Settings'],
             'answer': 'Try again'
-        }]
\ No newline at end of file
+        }]
+
+# Backends
+
+def _validate_flashcard(card):
+    if not _is_valid_flashcard(card):
+        raise ValueError("Invalid flashcard format")
+
+# Throttling and server errors are worth retrying; the 5xx and timeout
+# ones also count towards opening the circuit breaker
+RETRYABLE_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    TimeoutError,
+    ConnectionError,
+)
+OUTAGE_ERRORS = (
+    google_exceptions.ServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    TimeoutError,
+    ConnectionError,
+)
+
+admission = AdmissionController(
+    is_retryable=lambda e: isinstance(e, RETRYABLE_ERRORS),
+    is_outage=lambda e: isinstance(e, OUTAGE_ERRORS),
+)
+
+class GeminiProvider(Provider):
+    """
+    Generation with a Gemini model, one request per chunk of text
+
+    Every request goes through the shared admission controller, rate
+    limited per API key (rate_key).
+    """
+
+    name = 'gemini'
+    model_name = MODEL_NAME
+
+    def __init__(self, model, rate_key='server'):
+        self.model = model
+        self.rate_key = rate_key
+
+    def _generate(self, prompt):
+        return admission.call(self.rate_key, lambda timeout: self.model.generate_content(
+            prompt, request_options={'timeout': timeout}
+        ).text)
+
+    def _stream(self, prompt):
+        def start(timeout):
+            response = self.model.generate_content(
+                prompt, stream=True, request_options={'timeout': timeout}
+            )
+            return (part.text for part in response)
+        return admission.stream(self.rate_key, start)
+
+    def summary(self, text, max_words):
+        return self._generate(_summary_prompt(text, max_words))
+
+    def flashcards(self, text, num_cards):
+        return _parse_flashcards(self._generate(_flashcards_prompt(text, num_cards)), num_cards)
+
+    def questions(self, text, num_questions):
+        return _parse_questions(self._generate(_questions_prompt(text, num_questions)), num_questions)
+
+    def stream_summary(self, text, max_words):
+        return self._stream(_summary_prompt(text, max_words))
+
+    def stream_flashcards(self, text, num_cards):
+        return _stream_json_items(self._stream(_flashcards_prompt(text, num_cards)),
+                                  num_cards, _validate_flashcard, _parse_flashcards)
+
+    def stream_questions(self, text, num_questions):
+        return _stream_json_items(self._stream(_questions_prompt(text, num_questions)),
+                                  num_questions, _validate_question, _parse_questions)
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    LocalProvider.name: LocalProvider,
+}
+
+if AI_PROVIDER not in PROVIDERS:
+    raise ValueError(f"Unknown AI_PROVIDER: {AI_PROVIDER}")
+
+if AI_FALLBACK not in (LocalProvider.name, 'none'):
+    raise ValueError(f"Unknown AI_FALLBACK: {AI_FALLBACK}")
+
+local_provider = LocalProvider()
+
+def provider_model_name():
+    """Model name of the configured backend, used in AI cache keys"""
+    return PROVIDERS[AI_PROVIDER].model_name
+
+def get_provider(user_api_key=None):
+    """
+    Return the configured generation backend
+
+    Returns None when Gemini is selected but neither a user nor a server
+    API key is available.
+    """
+    if AI_PROVIDER == LocalProvider.name:
+        return local_provider
+    if user_api_key:
+        rate_key = hashlib.sha256(user_api_key.encode('utf-8')).hexdigest()
+        return GeminiProvider(get_model(user_api_key, MODEL_NAME), rate_key)
+    if model:
+        return GeminiProvider(model)
+    return None
+
+# Errors that mean the remote model is overloaded or slow rather than that
+# the request itself is bad
+FALLBACK_ERRORS = (
+    AdmissionError,
+    TimeoutError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+)
+
+def fallback_provider(provider):
+    """The backend to retry with when provider fails with FALLBACK_ERRORS, or None"""
+    if AI_FALLBACK == LocalProvider.name and provider is not local_provider:
+        return local_provider
+    return None
+
+def generate_with_fallback(provider, text, action, count, generate):
+    """
+    Return the result of generate(provider), which must return
+    (result, complete), retrying with the fallback backend on FALLBACK_ERRORS
+
+    Non-empty complete results are cached under the model that produced
+    them, so fallback output never takes the place of a Gemini result.
+    """
+    try:
+        result, complete = generate(provider)
+    except FALLBACK_ERRORS:
+        fallback = fallback_provider(provider)
+        if fallback is None:
+            raise
+        provider = fallback
+        result, complete = generate(provider)
+
+    # A retry may recover chunks that failed, so partial results aren't cached
+    if complete and result:
+        store_result(cache_key(text, action, count, provider.model_name), action, result)
+    return result
+
+# Streaming generation
+
+class JSONArrayStreamParser:
+    """
+    Incrementally extract complete objects from a JSON array as it streams in
+
+    feed() accepts arbitrary pieces of the model output (including a leading
+    markdown code fence) and returns the top-level array elements that became
+    complete, so each one can be shown before the rest of the array arrives.
+    Brackets that close without any elements (e.g. "Here are [5] cards:")
+    are skipped and scanning continues with the next '['.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._in_array = False
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escape = False
+        self._finished = False
+        self._elements = 0
+
+    def feed(self, text):
+        if self._finished:
+            return []
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if not self._in_array:
+                if ch == '[':
+                    self._in_array = True
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif ch in '}]':
+                if self._depth == 0:
+                    if self._elements == 0:
+                        # Brackets in prose before the array; keep looking
+                        self._in_array = False
+                        i += 1
+                        continue
+                    # End of the top-level array; ignore anything after it
+                    self._finished = True
+                    self._buffer = ''
+                    self._pos = 0
+                    return items
+                self._depth -= 1
+                if self._depth == 0:
+                    items.append(json.loads(buffer[self._start:i + 1]))
+                    self._elements += 1
+                    self._start = None
+            i += 1
+
+        # Drop text that can no longer be part of an unfinished element
+        keep = self._start if self._start is not None else i
+        self._buffer = buffer[keep:]
+        self._pos = i - keep
+        if self._start is not None:
+            self._start = 0
+        return items
+
+def _resolve_provider(user_api_key):
+    """Return the backend to use, raising ValueError with a user-facing message"""
+    try:
+        provider = get_provider(user_api_key)
+    except Exception as e:
+        raise ValueError(f"Error with provided API key: {str(e)}")
+    if provider is None:
+        raise ValueError("Please configure your Gemini API key in Settings to use AI generation.")
+    return provider
+
+def _stream_json_items(parts, limit, validate, parse):
+    """
+    Yield validated array elements from streamed pieces of model output
+
+    If the stream ends without yielding anything, the whole reply is handed
+    to parse(text, limit), the non-streaming parser, which raises on output
+    that holds no usable array (a refusal or a prose answer).
+    """
+    parser = JSONArrayStreamParser()
+    received = []
+    produced = 0
+    with closing(parts):
+        for part in parts:
+            received.append(part)
+            for item in parser.feed(part):
+                validate(item)
+                yield item
+                produced += 1
+                if produced >= limit:
+                    return
+    if not produced:
+        try:
+            items = parse(''.join(received), limit)
+        except ValueError:
+            raise ValueError("Invalid response format")
+        if not items:
+            raise ValueError("Invalid response format")
+        yield from items
+
+def stream_items(text, count, stream_chunk, max_chars=AI_CHUNK_CHARS,
+                 max_workers=AI_MAX_CONCURRENCY, failures=None):
+    """
+    Streaming counterpart of map_reduce_generate
+
+    stream_chunk(chunk_text, chunk_count) must return an iterator of dicts.
+    Chunks are streamed concurrently and items are yielded as soon as any
+    chunk produces them, with duplicate questions removed. Errors from
+    chunks that failed while others succeeded are appended to failures.
+    """
+    jobs = plan_chunks(text, count, max_chars)
+    if len(jobs) == 1:
+        yield from stream_chunk(*jobs[0])
+        return
+
+    results = queue.Queue()
+    done = object()
+    stop = threading.Event()
+
+    def run(chunk, n):
+        try:
+            for item in stream_chunk(chunk, n):
+                if stop.is_set():
+                    return
+                results.put(item)
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(done)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs))))
+    for chunk, n in jobs:
+        executor.submit(run, chunk, n)
+
+    try:
+        seen = set()
+        errors = []
+        remaining = len(jobs)
+        while remaining and len(seen) < count:
+            result = results.get()
+            if result is done:
+                remaining -= 1
+            elif isinstance(result, Exception):
+                errors.append(result)
+            else:
+                key = _dedupe_key(result)
+                if key not in seen:
+                    seen.add(key)
+                    yield result
+        if not seen and errors:
+            raise errors[0]
+        if failures is not None:
+            failures.extend(errors)
+    finally:
+        stop.set()
+        executor.shutdown(wait=False)
+
+def _stream_generated(text, action, count, user_api_key, method):
+    key = cache_key(text, action, count, provider_model_name())
+    cached = get_cached_result(key)
+    if cached is not None:
+        yield from cached
+        return
+
+    provider = _resolve_provider(user_api_key)
+    items = []
+    failures = []
+
+    def run(provider):
+        for item in stream_items(text, count, getattr(provider, method), failures=failures):
+            items.append(item)
+            yield item
+
+    try:
+        yield from run(provider)
+    except FALLBACK_ERRORS:
+        # Only switch backends if nothing has been sent yet
+        fallback = fallback_provider(provider)
+        if items or fallback is None:
+            raise
+        provider = fallback
+        failures.clear()
+        yield from run(provider)
+
+    if not items:
+        raise ValueError("No items were generated from this text")
+    # Only complete results are cached; the blocking generators share the key
+    if not failures:
+        store_result(cache_key(text, action, count, provider.model_name), action, items)
+
+def stream_flashcards(text, num_cards=10, user_api_key=None):
+    """Yield flashcards one at a time as the model produces them"""
+    return _stream_generated(text, 'flashcards', num_cards, user_api_key, 'stream_flashcards')
+
+def stream_multiple_choice(text, num_questions=5, user_api_key=None):
+    """Yield multiple choice questions one at a time as the model produces them"""
+    return _stream_generated(text, 'multiple_choice', num_questions, user_api_key, 'stream_questions')
+
+def stream_summary(text, max_words=200, user_api_key=None):
+    """Yield summary text as it is generated; the final text is cached formatted"""
+    key = cache_key(text, 'summary', max_words, provider_model_name())
+    cached = get_cached_result(key)
+    if cached is not None:
+        yield cached
+        return
+
+    provider = _resolve_provider(user_api_key)
+    parts = []
+    try:
+        for part in provider.stream_summary(text, max_words):
+            parts.append(part)
+            yield part
+    except FALLBACK_ERRORS:
+        fallback = fallback_provider(provider)
+        if parts or fallback is None:
+            raise
+        provider = fallback
+        for part in provider.stream_summary(text, max_words):
+            parts.append(part)
+            yield part
+
+    summary = _format_summary(''.join(parts))
+    if not summary:
+        raise ValueError("No summary was generated from this text")
+    store_result(cache_key(text, 'summary', max_words, provider.model_name), 'summary', summary)
@@ -1,33 +1,121 @@
 import os
-from flask import Flask, render_template, request, jsonify, send_file
-from werkzeug.utils import secure_filename
+import time
+import hashlib
+import multiprocessing
+from flask import Flask, Request, render_template, request, jsonify, send_file, url_for, make_response, Response, stream_with_context
 import json
 import csv
+import zlib
 from io import StringIO
-from datetime import datetime
+from datetime import datetime, timezone
 
-from models import init_db, Deck, Card, StudySession, QuizResult, Badge
-from ai_service import generate_summary, generate_flashcards, generate_multiple_choice
-from utils import process_pdf_file, allowed_file, clean_text
-from pdf_generator import generate_flashcards_pdf
+from models import init_db, init_app as init_db_app, Deck, Card, StudySession, QuizResult, Badge
+from ai_service import (MODEL_NAME, admission, generate_summary, generate_flashcards, generate_multiple_choice,
+                        stream_summary, stream_flashcards, stream_multiple_choice)
+from ai_clients import get_model
+from ai_limits import AdmissionError
+from utils import process_pdf_file, allowed_file, clean_text, UploadBuffer, UPLOAD_SPOOL_BYTES
+from pdf_generator import generate_flashcards_pdf, LAYOUTS as PDF_LAYOUTS
+from pdf_cache import cache_key as pdf_cache_key, get_cached_text, store_text
+from pdf_exports import exporter as pdf_exporter, PDF_EXPORT_WAIT
+from deck_import import open_import, detect_format, IMPORT_FORMATS, IMPORT_BATCH_SIZE, MAX_IMPORT_BATCH_SIZE
+from jobs import job_queue, job_events, JobError, JobQueueFull
+
+class UploadRequest(Request):
+    """Request that spools uploaded files into an UploadBuffer as they stream in"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # Spooled files keep the upload's extension, so a deck import never
+        # lands in the upload folder looking like a PDF
+        extension = os.path.splitext(filename or '')[1].lower()
+        suffix = extension if extension[1:].isascii() and extension[1:].isalnum() and len(extension) <= 10 else ''
+        return UploadBuffer(UPLOAD_SPOOL_BYTES, app.config['UPLOAD_FOLDER'],
+                            app.config['MAX_CONTENT_LENGTH'], suffix=suffix)
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.config['SECRET_KEY'] = os.environ.get('SESSION_SECRET', 'dev-secret-key-change-in-production')
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-init_db()
+# PDF worker processes, and the forkserver that starts them, import this
+# module as well; only the serving process touches the database
+IS_WORKER_PROCESS = __name__ == '__mp_main__' or multiprocessing.parent_process() is not None
+
+if not IS_WORKER_PROCESS:
+    init_db()
+init_db_app(app)
+
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+_static_fingerprints = {}
+
+def static_fingerprint(filename):
+    """Short content hash of a static file, recomputed only when it changes"""
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    
+    cached = _static_fingerprints.get(filename)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    
+    with open(path, 'rb') as f:
+        fingerprint = hashlib.sha256(f.read()).hexdigest()[:12]
+    _static_fingerprints[filename] = (mtime, fingerprint)
+    return fingerprint
+
+@app.template_global()
+def static_url(filename):
+    """URL for a static file with its content hash, safe to cache forever"""
+    fingerprint = static_fingerprint(filename)
+    if fingerprint is None:
+        return url_for('static', filename=filename)
+    return url_for('static', filename=filename, v=fingerprint)
 
 @app.after_request
 def add_header(response):
-    """Add headers to prevent caching"""
+    """Apply the caching policy for static files, validators and API responses"""
+    if request.endpoint == 'static':
+        filename = request.view_args.get('filename', '')
+        version = request.args.get('v')
+        if version and version == static_fingerprint(filename):
+            # The content behind a fingerprinted URL never changes
+            response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    if response.get_etag()[0]:
+        # Conditional responses may be stored but must be revalidated
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    # Everything else, including API mutations, is never stored
     response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, post-check=0, pre-check=0, max-age=0'
     response.headers['Pragma'] = 'no-cache'
     response.headers['Expires'] = '-1'
     return response
 
+def conditional_json(data):
+    """jsonify data with an ETag, answering 304 if the client's copy matches"""
+    response = jsonify(data)
+    response.add_etag()
+    return response.make_conditional(request)
+
+def deck_etag(deck, variant):
+    """ETag for a representation of a deck, derived from its content version"""
+    return f"deck-{deck['id']}-v{deck['version']}-{variant}"
+
+def not_modified(etag):
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -36,7 +124,7 @@ def index():
 def handle_decks():
     if request.method == 'GET':
         decks = Deck.get_all()
-        return jsonify(decks)
+        return conditional_json(decks)
     
     elif request.method == 'POST':
         data = request.json
@@ -48,18 +136,54 @@ def handle_deck(deck_id):
     if request.method == 'GET':
         deck = Deck.get_by_id(deck_id)
         if deck:
-            return jsonify(deck)
+            return conditional_json(deck)
         return jsonify({'error': 'Deck not found'}), 404
     
     elif request.method == 'DELETE':
         Deck.delete(deck_id)
+        pdf_exporter.invalidate(deck_id)
         return jsonify({'message': 'Deck deleted successfully'})
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+MAX_QUESTION_LENGTH = 1000
+MAX_ANSWER_LENGTH = 2000
+
+def get_page_args():
+    """Read ?limit=&after= pagination args, or None if the request is unpaginated"""
+    if 'limit' not in request.args and 'after' not in request.args:
+        return None
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return limit, request.args.get('after') or None
+
 @app.route('/api/decks/<int:deck_id>/cards', methods=['GET', 'POST'])
 def handle_cards(deck_id):
     if request.method == 'GET':
-        cards = Card.get_by_deck(deck_id)
-        return jsonify(cards)
+        page = get_page_args()
+        
+        # Answer revalidations from the deck version alone, without reading cards
+        deck = Deck.get_by_id(deck_id)
+        etag = None
+        if deck:
+            variant = 'cards' if page is None else f'cards-{page[0]}-{page[1] or ""}'
+            etag = deck_etag(deck, variant)
+            if etag in request.if_none_match:
+                return not_modified(etag)
+        
+        if page is None:
+            response = jsonify(Card.get_by_deck(deck_id))
+        else:
+            try:
+                cards, next_cursor = Card.get_page_by_deck(deck_id, *page)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            response = jsonify({'cards': cards, 'next_cursor': next_cursor})
+        
+        if etag:
+            response.set_etag(etag)
+        return response
     
     elif request.method == 'POST':
         if not request.json:
@@ -72,7 +196,7 @@ def handle_cards(deck_id):
         if not question or not answer:
             return jsonify({'error': 'Question and answer are required'}), 400
         
-        if len(question) > 1000 or len(answer) > 2000:
+        if len(question) > MAX_QUESTION_LENGTH or len(answer) > MAX_ANSWER_LENGTH:
             return jsonify({'error': 'Question or answer too long'}), 400
         
         try:
@@ -86,92 +210,427 @@ def handle_cards(deck_id):
         except Exception as e:
             return jsonify({'error': 'Failed to create card'}), 500
 
+MAX_BULK_CARDS = 500
+
+@app.route('/api/decks/<int:deck_id>/cards/bulk', methods=['POST'])
+def create_cards_bulk(deck_id):
+    """Create many cards in one request and one transaction"""
+    if not request.json:
+        return jsonify({'error': 'Invalid request'}), 400
+    
+    cards = request.json.get('cards', [])
+    
+    if not cards or not isinstance(cards, list):
+        return jsonify({'error': 'No cards provided'}), 400
+    
+    if len(cards) > MAX_BULK_CARDS:
+        return jsonify({'error': f'Cannot create more than {MAX_BULK_CARDS} cards at once'}), 400
+    
+    if not Deck.get_by_id(deck_id):
+        return jsonify({'error': 'Deck not found'}), 404
+    
+    # Validate every card before touching the database
+    validated = []
+    for i, card in enumerate(cards):
+        if not isinstance(card, dict):
+            return jsonify({'error': f'Card {i+1} is invalid'}), 400
+        
+        question = card.get('question') or ''
+        answer = card.get('answer') or ''
+        
+        if not isinstance(question, str) or not isinstance(answer, str):
+            return jsonify({'error': f'Card {i+1} has invalid field types'}), 400
+        
+        question = question.strip()
+        answer = answer.strip()
+        
+        if not question or not answer:
+            return jsonify({'error': f'Card {i+1}: question and answer are required'}), 400
+        
+        if len(question) > MAX_QUESTION_LENGTH or len(answer) > MAX_ANSWER_LENGTH:
+            return jsonify({'error': f'Card {i+1}: question or answer too long'}), 400
+        
+        validated.append({
+            'question': question,
+            'answer': answer,
+            'choices': card.get('choices')
+        })
+    
+    try:
+        card_ids = Card.create_many(deck_id, validated)
+        return jsonify({
+            'ids': card_ids,
+            'count': len(card_ids),
+            'message': 'Cards created successfully'
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Failed to create cards'}), 500
+
+# Validation errors listed in an import response; the rest are only counted
+MAX_IMPORT_ERRORS = 20
+
+@app.route('/api/decks/import', methods=['POST'])
+def import_deck():
+    """
+    Import cards from a JSON, CSV or Anki export
+    
+    The file is parsed while it is read and cards are inserted in
+    transactions of batch_size, so memory use does not grow with the deck.
+    Cards go into deck_id if given, otherwise into a new deck named after
+    the name field, the exported deck or the file. Rows failing the same
+    checks as single card creation are skipped and reported.
+    """
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        return jsonify({'error': 'No file provided'}), 400
+    
+    format = request.form.get('format') or detect_format(file.filename)
+    if format not in IMPORT_FORMATS:
+        return jsonify({'error': 'Unsupported file type. Use a JSON, CSV or Anki text export.'}), 400
+    
+    batch_size = request.form.get('batch_size', IMPORT_BATCH_SIZE, type=int)
+    batch_size = max(1, min(batch_size, MAX_IMPORT_BATCH_SIZE))
+    
+    deck_id = request.form.get('deck_id', type=int)
+    if deck_id is not None and not Deck.get_by_id(deck_id):
+        return jsonify({'error': 'Deck not found'}), 404
+    
+    started = time.monotonic()
+    reader, rows = open_import(file.stream, format)
+    imported = 0
+    skipped = 0
+    errors = []
+    batch = []
+    
+    def flush():
+        nonlocal deck_id, imported
+        if deck_id is None:
+            # Create the deck only once there is something to put in it
+            exported = reader.deck if reader and isinstance(reader.deck, dict) else {}
+            name = (request.form.get('name') or exported.get('name')
+                    or os.path.splitext(file.filename)[0] or 'Imported deck')
+            deck_id = Deck.create(str(name).strip()[:200], str(exported.get('description') or ''))
+        imported += len(Card.create_many(deck_id, batch))
+        batch.clear()
+    
+    try:
+        for position, row in rows:
+            question = row.get('question') if isinstance(row, dict) else None
+            answer = row.get('answer') if isinstance(row, dict) else None
+            
+            error = None
+            if not isinstance(question, str) or not isinstance(answer, str):
+                error = f'{position} is invalid'
+            elif not question.strip() or not answer.strip():
+                error = f'{position}: question and answer are required'
+            elif len(question.strip()) > MAX_QUESTION_LENGTH or len(answer.strip()) > MAX_ANSWER_LENGTH:
+                error = f'{position}: question or answer too long'
+            
+            if error:
+                skipped += 1
+                if len(errors) < MAX_IMPORT_ERRORS:
+                    errors.append(error)
+                continue
+            
+            batch.append({
+                'question': question.strip(),
+                'answer': answer.strip(),
+                'choices': row.get('choices')
+            })
+            if len(batch) >= batch_size:
+                flush()
+        
+        if batch:
+            flush()
+    except (ValueError, csv.Error, UnicodeDecodeError) as e:
+        return jsonify({
+            'error': f'Could not read file: {str(e)}',
+            'deck_id': deck_id,
+            'imported': imported
+        }), 400
+    except Exception as e:
+        print(f"Deck import error: {str(e)}")
+        return jsonify({'error': 'Failed to import cards', 'deck_id': deck_id, 'imported': imported}), 500
+    
+    if not imported:
+        return jsonify({'error': 'No valid cards found in file', 'skipped': skipped, 'errors': errors}), 400
+    
+    elapsed = time.monotonic() - started
+    return jsonify({
+        'deck_id': deck_id,
+        'imported': imported,
+        'skipped': skipped,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round((imported + skipped) / elapsed) if elapsed else None,
+        'message': f'Imported {imported} cards'
+    })
+
 @app.route('/api/cards/<int:card_id>', methods=['DELETE'])
 def delete_card(card_id):
     Card.delete(card_id)
     return jsonify({'message': 'Card deleted successfully'})
 
+def parse_text_request(data):
+    """Validate a generation request, raising ValueError with a user-facing message"""
+    text = clean_text(data.get('text', ''))
+    action = data.get('action', 'flashcards')
+    
+    if not text:
+        raise ValueError('No text provided')
+    
+    if len(text) < 50:
+        raise ValueError('Text too short. Please provide at least 50 characters.')
+    
+    if action == 'summary':
+        count = None
+    elif action == 'flashcards':
+        count = min(int(data.get('num_cards', 10)), 50)
+    elif action == 'multiple_choice':
+        count = min(int(data.get('num_questions', 5)), 25)
+    else:
+        raise ValueError('Invalid action')
+    
+    return {'text': text, 'action': action, 'count': count}
+
+def run_text_action(params, user_api_key=None):
+    """Run a validated generation request and return the response payload"""
+    text = params['text']
+    action = params['action']
+    
+    if action == 'summary':
+        return {'summary': generate_summary(text, user_api_key=user_api_key)}
+    elif action == 'flashcards':
+        return {'flashcards': generate_flashcards(text, params['count'], user_api_key=user_api_key)}
+    else:
+        return {'questions': generate_multiple_choice(text, params['count'], user_api_key=user_api_key)}
+
 @app.route('/api/process-text', methods=['POST'])
 def process_text():
     if not request.json:
         return jsonify({'error': 'Invalid request'}), 400
     
     data = request.json
-    text = clean_text(data.get('text', ''))
-    action = data.get('action', 'flashcards')
     
-    if not text:
-        return jsonify({'error': 'No text provided'}), 400
+    try:
+        params = parse_text_request(data)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
     
-    if len(text) < 50:
-        return jsonify({'error': 'Text too short. Please provide at least 50 characters.'}), 400
+    try:
+        return jsonify(run_text_action(params, user_api_key=data.get('api_key')))
+    except Exception as e:
+        return jsonify({'error': 'Failed to process text'}), 500
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def text_action_events(params, user_api_key=None):
+    """Yield Server-Sent Events for a generation request as results arrive"""
+    text = params['text']
+    action = params['action']
     
     try:
-        user_api_key = data.get('api_key')
-        
         if action == 'summary':
-            result = generate_summary(text, user_api_key=user_api_key)
-            return jsonify({'summary': result})
-        
-        elif action == 'flashcards':
-            num_cards = min(int(data.get('num_cards', 10)), 50)
-            flashcards = generate_flashcards(text, num_cards, user_api_key=user_api_key)
-            return jsonify({'flashcards': flashcards})
-        
-        elif action == 'multiple_choice':
-            num_questions = min(int(data.get('num_questions', 5)), 25)
-            questions = generate_multiple_choice(text, num_questions, user_api_key=user_api_key)
-            return jsonify({'questions': questions})
-        
+            for delta in stream_summary(text, user_api_key=user_api_key):
+                yield sse_event('summary', {'text': delta})
         else:
-            return jsonify({'error': 'Invalid action'}), 400
+            if action == 'flashcards':
+                items = stream_flashcards(text, params['count'], user_api_key=user_api_key)
+                event = 'card'
+            else:
+                items = stream_multiple_choice(text, params['count'], user_api_key=user_api_key)
+                event = 'question'
+            
+            for item in items:
+                yield sse_event(event, item)
+    except (ValueError, AdmissionError) as e:
+        yield sse_event('error', {'error': str(e)})
+        return
     except Exception as e:
-        return jsonify({'error': 'Failed to process text'}), 500
+        yield sse_event('error', {'error': 'Failed to process text'})
+        return
+    
+    yield sse_event('done', {})
 
-@app.route('/api/upload-pdf', methods=['POST'])
-def upload_pdf():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
+@app.route('/api/process-text/stream', methods=['POST'])
+def process_text_stream():
+    """Stream generated flashcards, questions or summary text as Server-Sent Events"""
+    if not request.json:
+        return jsonify({'error': 'Invalid request'}), 400
     
-    file = request.files['file']
+    data = request.json
+    
+    try:
+        params = parse_text_request(data)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
     
+    return Response(
+        stream_with_context(text_action_events(params, user_api_key=data.get('api_key'))),
+        mimetype='text/event-stream',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
+def read_upload(file):
+    """
+    Validate an uploaded PDF
+
+    The upload was already spooled into an UploadBuffer while the request
+    was parsed: in memory for small files, under UPLOAD_FOLDER for large ones.
+
+    Returns:
+        tuple: (buffer, None) on success, or (None, (error_response, status))
+    """
     if file.filename == '':
-        return jsonify({'error': 'No file selected'}), 400
+        return None, (jsonify({'error': 'No file selected'}), 400)
     
     if not file or not allowed_file(file.filename):
-        return jsonify({'error': 'Invalid file type. Only PDF files are allowed.'}), 400
+        return None, (jsonify({'error': 'Invalid file type. Only PDF files are allowed.'}), 400)
     
-    if file.content_length and file.content_length > app.config['MAX_CONTENT_LENGTH']:
-        return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 400
+    buffer = file.stream
+    if not isinstance(buffer, UploadBuffer) or buffer.size == 0:
+        return None, (jsonify({'error': 'File upload failed'}), 500)
     
-    filename = secure_filename(file.filename)
-    import uuid
-    unique_filename = f"{uuid.uuid4()}_{filename}"
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
+    return buffer, None
+
+def extract_upload_text(source, sha256=None):
+    """
+    Extract and clean text from an upload's bytes or file path, deleting the
+    file afterwards
+
+    When sha256 is given, text already extracted from identical bytes is
+    returned from the PDF text cache without extracting again.
+    """
+    key = pdf_cache_key(sha256) if sha256 else None
+    try:
+        cached = get_cached_text(key) if key else None
+        if cached is not None:
+            return cached
+        text = process_pdf_file(source)
+    finally:
+        if isinstance(source, str) and os.path.exists(source):
+            os.remove(source)
+    
+    if text and len(text.strip()) > 0:
+        text = clean_text(text)
+        if key:
+            store_text(key, text)
+        return text
+    return None
+
+@app.route('/api/upload-pdf', methods=['POST'])
+def upload_pdf():
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
     
     try:
-        file.save(filepath)
-        
-        if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
-            return jsonify({'error': 'File upload failed'}), 500
+        buffer, error = read_upload(request.files['file'])
+        if error:
+            return error
         
-        if os.path.getsize(filepath) > 16 * 1024 * 1024:
-            os.remove(filepath)
-            return jsonify({'error': 'File too large'}), 400
+        text = extract_upload_text(buffer.detach(), buffer.sha256)
         
-        text = process_pdf_file(filepath)
+        if text:
+            return jsonify({'text': text, 'message': 'PDF processed successfully'})
+        else:
+            return jsonify({'error': 'Could not extract text from PDF. File may be scanned or empty.'}), 400
+    except Exception as e:
+        return jsonify({'error': 'Error processing PDF. Please try again.'}), 500
+
+@job_queue.handler('process-text')
+def process_text_job(payload, progress):
+    progress(0.1, 'Generating with AI')
+    return run_text_action(payload, user_api_key=payload.get('api_key'))
+
+@job_queue.handler('upload-pdf')
+def upload_pdf_job(payload, progress):
+    # Small uploads are handed over in memory and don't survive a restart
+    source = payload.get('data') or payload.get('filepath')
+    if not source:
+        raise JobError('The uploaded file is no longer available. Please upload it again.')
+    
+    progress(0.1, 'Extracting text from PDF')
+    text = extract_upload_text(source, payload.get('sha256'))
+    if not text:
+        raise JobError('Could not extract text from PDF. File may be scanned or empty.')
+    return {'text': text, 'message': 'PDF processed successfully'}
+
+def job_accepted(job_id):
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('get_job', job_id=job_id),
+        'events_url': url_for('stream_job_events', job_id=job_id)
+    }), 202
+
+@app.route('/api/jobs/process-text', methods=['POST'])
+def submit_process_text_job():
+    """Queue a generation request and return immediately with a job id"""
+    if not request.json:
+        return jsonify({'error': 'Invalid request'}), 400
+    
+    data = request.json
+    
+    try:
+        params = parse_text_request(data)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        # The API key is only held in memory, never written to the jobs table
+        job_id = job_queue.submit('process-text', params, secrets={'api_key': data.get('api_key')})
+    except JobQueueFull:
+        return jsonify({'error': 'Server is busy. Please try again shortly.'}), 503
+    
+    return job_accepted(job_id)
+
+@app.route('/api/jobs/upload-pdf', methods=['POST'])
+def submit_upload_pdf_job():
+    """Accept an uploaded PDF and queue its text extraction"""
+    if 'file' not in request.files:
+        return jsonify({'error': 'No file provided'}), 400
+    
+    try:
+        buffer, error = read_upload(request.files['file'])
+        if error:
+            return error
         
-        os.remove(filepath)
+        # Duplicate uploads are answered straight from the text cache
+        text = get_cached_text(pdf_cache_key(buffer.sha256))
+        if text is not None:
+            return jsonify({'text': text, 'message': 'PDF processed successfully'})
         
-        if text and len(text.strip()) > 0:
-            return jsonify({'text': clean_text(text), 'message': 'PDF processed successfully'})
+        payload = {'sha256': buffer.sha256}
+        if buffer.path:
+            # Large uploads are already on disk; the job takes over the file
+            job_id = job_queue.submit('upload-pdf', dict(payload, filepath=buffer.path))
+            buffer.detach()
         else:
-            return jsonify({'error': 'Could not extract text from PDF. File may be scanned or empty.'}), 400
+            job_id = job_queue.submit('upload-pdf', payload, secrets={'data': buffer.source})
+        return job_accepted(job_id)
+    except JobQueueFull:
+        return jsonify({'error': 'Server is busy. Please try again shortly.'}), 503
     except Exception as e:
-        if os.path.exists(filepath):
-            os.remove(filepath)
         return jsonify({'error': 'Error processing PDF. Please try again.'}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """Stream job progress as Server-Sent Events until the job finishes"""
+    return Response(
+        stream_with_context(job_events(job_id)),
+        mimetype='text/event-stream',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/test-gemini', methods=['POST'])
 def test_gemini():
     if not request.json:
@@ -183,25 +642,18 @@ def test_gemini():
         return jsonify({'error': 'No API key provided'}), 400
     
     try:
-        import google.generativeai as genai
-        
-        GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
-        
-        genai.configure(api_key=api_key)
-        test_model = genai.GenerativeModel('gemini-2.0-flash')
-        
+        test_model = get_model(api_key, MODEL_NAME)
         response = test_model.generate_content("Say hello")
         
-        if GEMINI_API_KEY:
-            genai.configure(api_key=GEMINI_API_KEY)
-        
         return jsonify({'message': 'API key is valid', 'test_response': response.text})
     except Exception as e:
-        GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY', '')
-        if GEMINI_API_KEY:
-            genai.configure(api_key=GEMINI_API_KEY)
         return jsonify({'error': f'API key test failed: {str(e)}'}), 400
 
+@app.route('/api/ai/metrics', methods=['GET'])
+def ai_metrics():
+    """Admission control counters for model calls: queue wait, rejections, retries"""
+    return jsonify(admission.metrics())
+
 @app.route('/api/study/<int:card_id>', methods=['POST'])
 def study_card(card_id):
     if not request.json:
@@ -228,10 +680,88 @@ def study_card(card_id):
     except Exception as e:
         return jsonify({'error': 'Failed to record study session'}), 500
 
+MAX_BATCH_REVIEWS = 500
+
+def parse_reviewed_at(value):
+    """Parse a client review timestamp into a naive UTC datetime.
+
+    Accepts ISO 8601 strings or epoch milliseconds. Missing values mean
+    "now"; timestamps in the future are clamped to now.
+    """
+    now = datetime.utcnow()
+    if value is None:
+        return now
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        reviewed_at = datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+    elif isinstance(value, str):
+        reviewed_at = datetime.fromisoformat(value)
+    else:
+        raise ValueError('Invalid timestamp')
+    if reviewed_at.tzinfo is not None:
+        reviewed_at = reviewed_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(reviewed_at, now)
+
+@app.route('/api/study/batch', methods=['POST'])
+def study_batch():
+    """Record many buffered reviews in one transaction"""
+    if not request.json:
+        return jsonify({'error': 'Invalid request'}), 400
+    
+    reviews = request.json.get('reviews', [])
+    
+    if not isinstance(reviews, list):
+        return jsonify({'error': 'Invalid reviews format'}), 400
+    
+    if len(reviews) > MAX_BATCH_REVIEWS:
+        return jsonify({'error': f'Cannot record more than {MAX_BATCH_REVIEWS} reviews at once'}), 400
+    
+    parsed = []
+    for i, review in enumerate(reviews):
+        if not isinstance(review, dict):
+            return jsonify({'error': f'Review {i+1} is invalid'}), 400
+        
+        try:
+            card_id = int(review.get('card_id'))
+            quality = int(review.get('quality', 3))
+            reviewed_at = parse_reviewed_at(review.get('reviewed_at'))
+        except (ValueError, TypeError, OverflowError, OSError):
+            return jsonify({'error': f'Review {i+1} has invalid values'}), 400
+        
+        if quality < 0 or quality > 5:
+            return jsonify({'error': f'Review {i+1}: quality must be between 0 and 5'}), 400
+        
+        parsed.append((card_id, quality, reviewed_at))
+    
+    try:
+        recorded = StudySession.update_many(parsed)
+        newly_earned = Badge.check_and_award() if recorded else []
+        
+        return jsonify({
+            'message': 'Study sessions recorded',
+            'recorded': recorded,
+            'skipped': len(parsed) - recorded,
+            'badges_earned': newly_earned
+        })
+    except Exception as e:
+        return jsonify({'error': 'Failed to record study sessions'}), 500
+
 @app.route('/api/decks/<int:deck_id>/due-cards', methods=['GET'])
 def get_due_cards(deck_id):
-    cards = Card.get_due_cards(deck_id)
-    return jsonify(cards)
+    page = get_page_args()
+    if page is None:
+        cards = Card.get_due_cards(deck_id)
+        return jsonify(cards)
+    
+    try:
+        cards, next_cursor = Card.get_due_page(deck_id, *page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    response = {'cards': cards, 'next_cursor': next_cursor}
+    # The total is only needed once, when a study session starts
+    if not page[1]:
+        response['due_count'] = Card.count_due(deck_id)
+    return jsonify(response)
 
 @app.route('/settings')
 def settings_page():
@@ -272,97 +802,174 @@ def get_quiz_results(deck_id):
 @app.route('/api/stats', methods=['GET'])
 def get_stats():
     stats = StudySession.get_stats()
-    return jsonify(stats)
+    return conditional_json(stats)
 
 @app.route('/api/badges', methods=['GET'])
 def get_badges():
     badges = Badge.get_all()
-    return jsonify(badges)
+    return conditional_json(badges)
 
 @app.route('/api/export/<int:deck_id>/<format>', methods=['GET'])
 def export_deck(deck_id, format):
     deck = Deck.get_by_id(deck_id)
-    cards = Card.get_by_deck(deck_id)
     
     if not deck:
         return jsonify({'error': 'Deck not found'}), 404
     
+    if format not in ('json', 'csv', 'anki', 'pdf'):
+        return jsonify({'error': 'Invalid format'}), 400
+    
+    layout = request.args.get('layout', 'list')
+    if format == 'pdf' and layout not in PDF_LAYOUTS:
+        return jsonify({'error': 'Invalid layout'}), 400
+    
+    # Gzipped and plain bodies are different representations
+    use_gzip = format != 'pdf' and request.accept_encodings['gzip'] > 0
+    
+    # Exports only change when the deck's cards do
+    variant = format + ('-gzip' if use_gzip else '') + (f'-{layout}' if format == 'pdf' else '')
+    etag = deck_etag(deck, variant)
+    if etag in request.if_none_match:
+        return not_modified(etag)
+    
+    if format == 'pdf':
+        response = make_response(pdf_export_response(deck, layout))
+    else:
+        response = stream_export(deck, format, use_gzip)
+    if response.status_code == 200:
+        response.set_etag(etag)
+    return response
+
+def export_filename(deck, suffix):
     # Sanitize filename
     safe_deck_name = "".join(c for c in deck['name'] if c.isalnum() or c in (' ', '-', '_')).strip()
+    return f"{safe_deck_name or 'deck'}{suffix}"
+
+EXPORT_BATCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    # format: (mimetype, filename suffix)
+    'json': ('application/json', '.json'),
+    'csv': ('text/csv', '.csv'),
+    'anki': ('text/plain', '_anki.txt'),
+}
+
+def json_export_chunks(deck, batches):
+    """Yield the same document as json.dumps({'deck', 'cards'}, indent=2), a batch at a time"""
+    indent = lambda text, prefix: text.replace('\n', '\n' + prefix)
+    yield '{\n  "deck": ' + indent(json.dumps(deck, indent=2), '  ') + ',\n  "cards": ['
     
-    if format == 'json':
-        data = {
-            'deck': deck,
-            'cards': cards
-        }
-        from flask import Response
-        import json as json_lib
-        
-        response = Response(
-            json_lib.dumps(data, indent=2),
-            mimetype='application/json',
-            headers={
-                'Content-Disposition': f'attachment; filename={safe_deck_name or "deck"}.json'
-            }
-        )
-        return response
+    first = True
+    for cards in batches:
+        parts = []
+        for card in cards:
+            parts.append(('\n    ' if first else ',\n    ') + indent(json.dumps(card, indent=2), '    '))
+            first = False
+        yield ''.join(parts)
     
-    elif format == 'csv':
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['Question', 'Answer'])
-        
+    yield ']\n}' if first else '\n  ]\n}'
+
+def csv_export_chunks(batches):
+    output = StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Question', 'Answer'])
+    
+    for cards in batches:
         for card in cards:
             writer.writerow([card['question'], card['answer']])
-        
+        yield output.getvalue()
         output.seek(0)
-        return output.getvalue(), 200, {
-            'Content-Type': 'text/csv',
-            'Content-Disposition': f'attachment; filename={safe_deck_name or "deck"}.csv'
-        }
+        output.truncate()
     
-    elif format == 'anki':
-        output = StringIO()
-        for card in cards:
-            output.write(f"{card['question']}\t{card['answer']}\n")
-        
-        output.seek(0)
-        return output.getvalue(), 200, {
-            'Content-Type': 'text/plain',
-            'Content-Disposition': f'attachment; filename={safe_deck_name or "deck"}_anki.txt'
-        }
-    
-    elif format == 'pdf':
-        # Convert cards to the format expected by PDF generator
-        pdf_cards = []
-        for card in cards:
+    # Header only, for an empty deck
+    yield output.getvalue()
+
+def anki_export_chunks(batches):
+    for cards in batches:
+        yield ''.join(f"{card['question']}\t{card['answer']}\n" for card in cards)
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def stream_export(deck, format, use_gzip=False):
+    """
+    Stream a JSON, CSV or Anki export straight from a database cursor
+
+    Cards are read and written EXPORT_BATCH_SIZE at a time, so memory use
+    does not grow with the deck and the download starts immediately.
+    """
+    batches = Card.iter_by_deck(deck['id'], EXPORT_BATCH_SIZE)
+    if format == 'json':
+        chunks = json_export_chunks(deck, batches)
+    elif format == 'csv':
+        chunks = csv_export_chunks(batches)
+    else:
+        chunks = anki_export_chunks(batches)
+    
+    mimetype, suffix = EXPORT_FORMATS[format]
+    headers = {
+        'Content-Disposition': f'attachment; filename={export_filename(deck, suffix)}',
+        'Vary': 'Accept-Encoding'
+    }
+    if use_gzip:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+def pdf_export_cards(deck):
+    # Convert cards to the format expected by PDF generator
+    pdf_cards = []
+    for batch in Card.iter_by_deck(deck['id'], EXPORT_BATCH_SIZE):
+        for card in batch:
             pdf_card = {
                 'question': card['question'],
                 'answer': card['answer']
             }
-            if card.get('choices'):
-                try:
-                    pdf_card['choices'] = json.loads(card['choices'])
-                except:
-                    pass
+            if isinstance(card.get('choices'), list):
+                pdf_card['choices'] = card['choices']
             pdf_cards.append(pdf_card)
+    return pdf_cards
+
+def pdf_export_response(deck, layout='list'):
+    """
+    Serve a deck's rendered PDF from disk, rendering it first if this
+    version of the deck hasn't been rendered in this layout yet. Renders
+    that outlast PDF_EXPORT_WAIT answer 202 and carry on in the background,
+    so retrying the same URL picks up the finished file.
+    """
+    pdf_file = pdf_exporter.open(deck, layout)
+    
+    if pdf_file is None:
+        pdf_cards = pdf_export_cards(deck)
+        if not pdf_cards:
+            return jsonify({'error': 'Deck has no cards to export'}), 400
         
         try:
-            pdf_buffer = generate_flashcards_pdf(pdf_cards, deck['name'])
-            
-            return send_file(
-                pdf_buffer,
-                mimetype='application/pdf',
-                as_attachment=True,
-                download_name=f"{safe_deck_name or 'deck'}_flashcards.pdf"
-            )
+            path = pdf_exporter.render(deck, layout, pdf_cards).result(timeout=PDF_EXPORT_WAIT)
+            pdf_file = open(path, 'rb')
+        except TimeoutError:
+            response = jsonify({'status': 'rendering', 'message': 'PDF is still being generated'})
+            response.status_code = 202
+            response.headers['Retry-After'] = '2'
+            return response
         except Exception as e:
             print(f"PDF generation error: {str(e)}")
             import traceback
             traceback.print_exc()
             return jsonify({'error': f'Failed to generate PDF: {str(e)}'}), 500
     
-    return jsonify({'error': 'Invalid format'}), 400
+    return send_file(
+        pdf_file,
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=export_filename(deck, '_flashcards.pdf')
+    )
 
 @app.route('/api/export-cards-pdf', methods=['POST'])
 def export_cards_pdf():
@@ -372,13 +979,14 @@ def export_cards_pdf():
     
     cards = request.json.get('cards', [])
     deck_name = request.json.get('deck_name', 'Flashcards')
+    layout = request.json.get('layout', 'list')
     
     # Validate input
     if not cards or not isinstance(cards, list):
         return jsonify({'error': 'No cards provided'}), 400
     
-    if len(cards) > 100:
-        return jsonify({'error': 'Cannot export more than 100 cards at once'}), 400
+    if layout not in PDF_LAYOUTS:
+        return jsonify({'error': 'Invalid layout'}), 400
     
     if not isinstance(deck_name, str):
         deck_name = 'Flashcards'
@@ -438,7 +1046,7 @@ def export_cards_pdf():
             card['choices'] = trimmed_choices
     
     try:
-        pdf_buffer = generate_flashcards_pdf(cards, deck_name)
+        pdf_buffer = generate_flashcards_pdf(cards, deck_name, layout)
         
         # Sanitize filename
         safe_filename = "".join(c for c in deck_name if c.isalnum() or c in (' ', '-', '_')).strip()
@@ -479,6 +1087,10 @@ def service_worker():
 def manifest():
     return send_file('static/manifest.json', mimetype='application/manifest+json')
 
+@app.errorhandler(413)
+def too_large(error):
+    return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
+
 @app.errorhandler(404)
 def not_found(error):
     # If it's an API request, return JSON
@@ -489,5 +1101,9 @@ def not_found(error):
     from flask import redirect
     return redirect('/')
 
+# Resume jobs queued before the last restart once every handler is registered
+if not IS_WORKER_PROCESS:
+    job_queue.recover()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
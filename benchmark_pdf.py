@@ -0,0 +1,40 @@
+
+"""
+Measure PDF export cost per card for each layout
+
+Usage: python benchmark_pdf.py [card counts...]   (default: 100 1000 5000)
+"""
+import sys
+import time
+from pdf_generator import generate_flashcards_pdf, LAYOUTS
+
+def make_cards(count):
+    """Build a deck mixing plain flashcards and multiple choice questions"""
+    cards = []
+    for i in range(count):
+        if i % 3 == 2:
+            cards.append({
+                'question': f'Question {i}: which of these terms is defined in section {i % 40}?',
+                'choices': [f'Term {i}', f'Term {i + 1}', f'Term {i + 2}', f'Term {i + 3}'],
+                'answer': f'Term {i}'
+            })
+        else:
+            cards.append({
+                'question': f'What is concept number {i} & why does it matter?',
+                'answer': f'Concept {i} is a worked example answer. ' * (1 + i % 4)
+            })
+    return cards
+
+def run(counts):
+    print(f"{'layout':<10}{'cards':>8}{'seconds':>10}{'ms/card':>10}{'KB':>10}")
+    for layout in LAYOUTS:
+        for count in counts:
+            cards = make_cards(count)
+            started = time.perf_counter()
+            buffer = generate_flashcards_pdf(cards, 'Benchmark Deck', layout)
+            elapsed = time.perf_counter() - started
+            size = len(buffer.getvalue()) / 1024
+            print(f"{layout:<10}{count:>8}{elapsed:>10.2f}{elapsed / count * 1000:>10.2f}{size:>10.0f}")
+
+if __name__ == '__main__':
+    run([int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000])
@@ -0,0 +1,120 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = int(os.environ.get('CACHE_TTL', 60))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+
+# Returned by get() on a miss, so falsy values like [] can still be cached
+MISSING = object()
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with per-entry expiry
+
+    Values are returned as stored, so callers must treat them as read-only.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, default_ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class RedisCache:
+    """Cache backed by a Redis-compatible server, shared between processes
+
+    Connection errors are treated as cache misses so an unavailable server
+    only costs the database queries the cache would have saved.
+    """
+
+    def __init__(self, url, default_ttl=DEFAULT_TTL, prefix='flashcards:'):
+        import redis
+
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._errors = redis.RedisError
+
+    def get(self, key):
+        try:
+            raw = self._client.get(self.prefix + key)
+        except self._errors:
+            return MISSING
+        return MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        try:
+            self._client.set(self.prefix + key, pickle.dumps(value),
+                             ex=ttl if ttl is not None else self.default_ttl)
+        except self._errors:
+            pass
+
+    def delete(self, *keys):
+        if not keys:
+            return
+        try:
+            self._client.delete(*(self.prefix + key for key in keys))
+        except self._errors:
+            pass
+
+    def clear(self):
+        try:
+            for key in self._client.scan_iter(match=self.prefix + '*'):
+                self._client.delete(key)
+        except self._errors:
+            pass
+
+def create_cache():
+    """Build the cache backend selected by the CACHE_REDIS_URL environment variable"""
+    url = os.environ.get('CACHE_REDIS_URL')
+    if url:
+        try:
+            return RedisCache(url)
+        except ImportError:
+            print("CACHE_REDIS_URL is set but the redis package is not installed, "
+                  "using the in-process cache")
+    return LRUCache()
+
+cache = create_cache()
+
+def get_or_set(key, loader, ttl=None):
+    """Return the cached value for key, calling loader() to fill it on a miss"""
+    value = cache.get(key)
+    if value is MISSING:
+        value = loader()
+        cache.set(key, value, ttl)
+    return value
+
+def invalidate(*keys):
+    cache.delete(*keys)
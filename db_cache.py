@@ -0,0 +1,60 @@
+from models import get_db
+
+class CacheTable:
+    """
+    Least recently used store kept in a SQLite table, capped by total size
+
+    The table needs a key primary key, size and last_used_at columns and
+    the value column; put() may fill in other columns as well. Sizes are
+    whatever the caller counts, e.g. bytes of the stored value.
+    """
+
+    def __init__(self, table, value_column, max_bytes):
+        self.table = table
+        self.value_column = value_column
+        self.max_bytes = max_bytes
+
+    def get(self, key):
+        """Return the stored value for key, or None on a miss"""
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {self.value_column} FROM {self.table} WHERE key = ?', (key,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        cursor.execute(f'UPDATE {self.table} SET last_used_at = CURRENT_TIMESTAMP WHERE key = ?', (key,))
+        conn.commit()
+        return row[0]
+
+    def put(self, key, value, size, **columns):
+        """Store value, evicting least recently used entries over the size cap"""
+        if size > self.max_bytes:
+            return
+
+        fields = {'key': key, self.value_column: value, 'size': size, **columns}
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"INSERT OR REPLACE INTO {self.table} ({', '.join(fields)}) "
+            f"VALUES ({', '.join('?' for _ in fields)})",
+            tuple(fields.values())
+        )
+
+        cursor.execute(f'SELECT COALESCE(SUM(size), 0) FROM {self.table}')
+        excess = cursor.fetchone()[0] - self.max_bytes
+        if excess > 0:
+            cursor.execute(f'''
+                SELECT key, size FROM {self.table}
+                WHERE key != ?
+                ORDER BY last_used_at, rowid
+            ''', (key,))
+            evicted = []
+            for row in cursor:
+                if excess <= 0:
+                    break
+                evicted.append((row['key'],))
+                excess -= row['size']
+            cursor.executemany(f'DELETE FROM {self.table} WHERE key = ?', evicted)
+
+        conn.commit()
@@ -0,0 +1,162 @@
+import io
+import os
+import csv
+import json
+
+# Cards inserted per transaction when importing a deck
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+MAX_IMPORT_BATCH_SIZE = 10000
+
+# Characters of the uploaded file decoded at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+IMPORT_FORMATS = ('json', 'csv', 'anki')
+
+# File extension: format, matching the names export_deck gives its downloads
+IMPORT_EXTENSIONS = {
+    '.json': 'json',
+    '.csv': 'csv',
+    '.txt': 'anki',
+    '.tsv': 'anki',
+}
+
+def detect_format(filename):
+    return IMPORT_EXTENSIONS.get(os.path.splitext(filename or '')[1].lower())
+
+class JSONCardReader:
+    """
+    Read cards from a deck export one at a time
+
+    Accepts the {"deck": {...}, "cards": [...]} document written by
+    export_deck, or a bare array of cards. Only the element being decoded
+    is held in memory, so the size of the file doesn't matter. The exported
+    deck object, if any, is available as .deck once cards start arriving.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self.deck = None
+
+    def _fill(self):
+        """Read more text, returning False at the end of the file"""
+        if self._eof:
+            return False
+        chunk = self._stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        """Skip whitespace and return the next character, or '' at the end"""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos].isspace():
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars):
+        ch = self._peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"Invalid JSON: expected {' or '.join(repr(c) for c in chars)}")
+        self._pos += 1
+        return ch
+
+    def _value(self):
+        self._peek()
+        decoder = json.JSONDecoder()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise ValueError('Invalid JSON: file ends in the middle of a value')
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
+
+    def __iter__(self):
+        if self._peek() == '[':
+            yield from self._array()
+            return
+
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == 'cards':
+                yield from self._array()
+            elif key == 'deck':
+                self.deck = self._value()
+            else:
+                self._value()
+            if self._expect(',}') == '}':
+                return
+
+def _csv_rows(stream):
+    reader = csv.reader(stream)
+    start = 1
+    for row in reader:
+        # A quoted field can span lines; report the line the row starts on
+        line, start = start, reader.line_num + 1
+        # Skip the header row that CSV exports start with
+        if line == 1 and [cell.strip().lower() for cell in row[:2]] == ['question', 'answer']:
+            continue
+        if not any(cell.strip() for cell in row):
+            continue
+        yield f'Line {line}', {'question': row[0], 'answer': row[1] if len(row) > 1 else ''}
+
+def _anki_rows(stream):
+    for number, line in enumerate(stream, 1):
+        line = line.rstrip('\r\n')
+        # Anki writes "#separator:tab" style headers before the notes
+        if not line.strip() or line.startswith('#'):
+            continue
+        question, _, answer = line.partition('\t')
+        yield f'Line {number}', {'question': question, 'answer': answer}
+
+def _json_rows(reader):
+    for number, card in enumerate(reader, 1):
+        yield f'Card {number}', card
+
+def open_import(binary_stream, format):
+    """
+    Return (reader, rows) for an uploaded deck file
+
+    rows yields (position, card) pairs as the file is read, where position
+    names the card for error messages: "Line N" of a CSV or Anki file, or
+    "Card N" of a JSON cards array. reader is the JSONCardReader for JSON
+    imports (to look up the exported deck's name) and None otherwise.
+    Malformed input raises ValueError, csv.Error or UnicodeDecodeError while
+    iterating.
+    """
+    # utf-8-sig also accepts the byte order mark spreadsheet programs add
+    text = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    if format == 'json':
+        reader = JSONCardReader(text)
+        return reader, _json_rows(reader)
+    if format == 'csv':
+        return None, _csv_rows(text)
+    return None, _anki_rows(text)
@@ -0,0 +1,299 @@
+import os
+import json
+import uuid
+import time
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from models import get_db
+
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+# Jobs accepted but not yet finished; submissions beyond this are rejected
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 50))
+# How often a process refreshes updated_at on the jobs it is running
+JOB_HEARTBEAT_SECONDS = 30
+# A 'running' job without a heartbeat for this long belonged to a process that died
+JOB_STALE_SECONDS = 3 * JOB_HEARTBEAT_SECONDS
+JOB_RETENTION_DAYS = 1
+
+FINISHED_STATUSES = ('done', 'failed')
+INTERRUPTED_ERROR = 'Job was interrupted. Please try again.'
+SECRETS_LOST_ERROR = 'Job was interrupted by a server restart before it started. Please submit it again.'
+
+class JobQueueFull(Exception):
+    pass
+
+class JobError(Exception):
+    """Raised by handlers with a message that is safe to show to the user"""
+    pass
+
+class JobQueue:
+    """
+    Bounded background worker pool backed by the jobs table
+
+    Handlers are registered per job kind and called as
+    handler(payload, progress), where progress(fraction, message=None)
+    records how far along the job is. The return value must be JSON
+    serializable and becomes the job result.
+
+    Running jobs record the process that owns them ("host:pid") and a
+    heartbeat thread keeps their updated_at fresh, so a job whose process
+    died is failed rather than left 'running' forever.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING):
+        self._handlers = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-worker')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._changed = threading.Condition()
+        self._heartbeat = None
+        self._heartbeat_lock = threading.Lock()
+
+    @staticmethod
+    def _owner():
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def handler(self, kind):
+        def register(func):
+            self._handlers[kind] = func
+            return func
+        return register
+
+    def submit(self, kind, payload, secrets=None):
+        """
+        Queue a job and return its id without waiting for it to run
+
+        Args:
+            kind: Registered handler name
+            payload: JSON-serializable handler input, persisted with the job
+            secrets: Extra handler input kept in memory only (e.g. API keys).
+                     If this process exits before the job runs, the job is
+                     failed rather than resumed without them.
+
+        Raises:
+            JobQueueFull: If too many jobs are already pending
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull()
+
+        job_id = uuid.uuid4().hex
+        has_secrets = any(value is not None for value in (secrets or {}).values())
+        try:
+            conn = get_db()
+            conn.execute(
+                'INSERT INTO jobs (id, kind, payload, owner, has_secrets) VALUES (?, ?, ?, ?, ?)',
+                (job_id, kind, json.dumps(payload), self._owner(), int(has_secrets))
+            )
+            conn.commit()
+            self._executor.submit(self._run, job_id, kind, dict(payload, **(secrets or {})))
+        except Exception:
+            self._slots.release()
+            raise
+        return job_id
+
+    def get(self, job_id):
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, kind, status, progress, message, result, error, created_at, updated_at
+            FROM jobs WHERE id = ?
+        ''', (job_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        if row['status'] == 'running' and self._fail_abandoned(conn, job_id):
+            return self.get(job_id)
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def wait_for_change(self, timeout):
+        """Block until any job in this process changes, or timeout elapses"""
+        with self._changed:
+            return self._changed.wait(timeout)
+
+    def recover(self):
+        """Fail jobs whose process died, requeue queued ones and prune old ones"""
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, owner FROM jobs WHERE status = 'running'")
+        for row in cursor.fetchall():
+            if _owner_gone(row['owner']):
+                self._fail(conn, row['id'])
+        self._fail_abandoned(conn)
+        cursor.execute('''
+            DELETE FROM jobs
+            WHERE status IN ('done', 'failed') AND updated_at < datetime('now', ?)
+        ''', (f'-{JOB_RETENTION_DAYS} days',))
+        conn.commit()
+
+        cursor.execute("SELECT id, kind, payload, owner, has_secrets FROM jobs WHERE status = 'queued' ORDER BY created_at")
+        for row in cursor.fetchall():
+            if row['has_secrets']:
+                # Secrets (e.g. the user's API key) lived only in the process
+                # that accepted the job. Running it without them would quietly
+                # switch to the server's key, so it is failed for the user to
+                # resubmit once that process is gone.
+                if _owner_gone(row['owner']):
+                    self._fail(conn, row['id'], status='queued', error=SECRETS_LOST_ERROR)
+                continue
+            if row['kind'] not in self._handlers or not self._slots.acquire(blocking=False):
+                continue
+            self._executor.submit(self._run, row['id'], row['kind'], json.loads(row['payload'] or '{}'))
+
+    def _run(self, job_id, kind, payload):
+        try:
+            # Claim the job atomically so a job is never run twice
+            conn = get_db()
+            cursor = conn.execute('''
+                UPDATE jobs SET status = 'running', owner = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'queued'
+            ''', (self._owner(), job_id))
+            conn.commit()
+            if cursor.rowcount != 1:
+                return
+            self._start_heartbeat()
+            self._notify()
+
+            try:
+                result = self._handlers[kind](
+                    payload,
+                    lambda progress, message=None: self._update(job_id, progress=progress, message=message)
+                )
+            except JobError as e:
+                self._update(job_id, status='failed', error=str(e))
+            except Exception:
+                traceback.print_exc()
+                self._update(job_id, status='failed', error='Job failed. Please try again.')
+            else:
+                self._update(job_id, status='done', progress=1, result=json.dumps(result))
+        finally:
+            self._slots.release()
+
+    def _update(self, job_id, **fields):
+        fields = {key: value for key, value in fields.items() if value is not None}
+        assignments = ', '.join(f'{key} = ?' for key in fields)
+        conn = get_db()
+        conn.execute(
+            f'UPDATE jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+            (*fields.values(), job_id)
+        )
+        conn.commit()
+        self._notify()
+
+    def _fail(self, conn, job_id, status='running', error=INTERRUPTED_ERROR):
+        conn.execute('''
+            UPDATE jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = ?
+        ''', (error, job_id, status))
+        conn.commit()
+
+    def _fail_abandoned(self, conn, job_id=None):
+        """Fail running jobs (or just job_id) whose heartbeat stopped, returning how many"""
+        query = '''
+            UPDATE jobs SET status = 'failed', error = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'running' AND updated_at < datetime('now', ?)
+        '''
+        params = [INTERRUPTED_ERROR, f'-{JOB_STALE_SECONDS} seconds']
+        if job_id is not None:
+            query += ' AND id = ?'
+            params.append(job_id)
+        cursor = conn.execute(query, params)
+        conn.commit()
+        if cursor.rowcount:
+            self._notify()
+        return cursor.rowcount
+
+    def _start_heartbeat(self):
+        with self._heartbeat_lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name='job-heartbeat', daemon=True)
+                self._heartbeat.start()
+
+    def _beat(self):
+        """Refresh updated_at on this process's running jobs until there are none"""
+        owner = self._owner()
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                conn = get_db()
+                conn.execute('''
+                    UPDATE jobs SET updated_at = CURRENT_TIMESTAMP
+                    WHERE status = 'running' AND owner = ?
+                ''', (owner,))
+                conn.commit()
+                # Checked under the lock so a job claimed meanwhile either
+                # shows up here or starts a new heartbeat
+                with self._heartbeat_lock:
+                    running = conn.execute(
+                        "SELECT 1 FROM jobs WHERE status = 'running' AND owner = ? LIMIT 1", (owner,)
+                    ).fetchone()
+                    if running is None:
+                        self._heartbeat = None
+                        return
+            except Exception:
+                traceback.print_exc()
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+def _owner_gone(owner):
+    """
+    Whether the process that owns a job ("host:pid") has exited
+
+    Only processes on this host can be checked; jobs owned elsewhere are
+    left to the heartbeat. Jobs with no owner predate owners and count as gone.
+    """
+    if not owner:
+        return True
+    host, _, pid = owner.rpartition(':')
+    if host != socket.gethostname():
+        return False
+    return not (pid.isdigit() and _process_alive(int(pid)))
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+job_queue = JobQueue()
+
+def job_events(job_id, poll_interval=1.0, keepalive_interval=15):
+    """
+    Yield Server-Sent Events for a job until it finishes
+
+    Each event carries the job as JSON. Changes made by this process wake
+    the stream immediately; poll_interval bounds the delay for jobs run by
+    other processes.
+    """
+    last = None
+    idle = 0.0
+    while True:
+        job = job_queue.get(job_id)
+        if job is None:
+            yield 'event: error\ndata: {"error": "Job not found"}\n\n'
+            return
+
+        snapshot = (job['status'], job['progress'], job['message'])
+        if snapshot != last:
+            last = snapshot
+            idle = 0.0
+            yield f"data: {json.dumps(job)}\n\n"
+        elif idle >= keepalive_interval:
+            idle = 0.0
+            yield ': keep-alive\n\n'
+
+        if job['status'] in FINISHED_STATUSES:
+            return
+
+        job_queue.wait_for_change(poll_interval)
+        idle += poll_interval
@@ -1,14 +1,469 @@
 import sqlite3
+import threading
+import base64
+import queue
 from datetime import datetime
 import json
 
+from flask import g, has_app_context
+
+from cache import get_or_set, invalidate
+
 DATABASE = 'flashcards.db'
 
-def get_db():
-    conn = sqlite3.connect(DATABASE)
+POOL_SIZE = 8
+STATEMENT_CACHE_SIZE = 256
+
+# Connection-level tuning applied once when a connection is opened.
+# cache_size is in KiB when negative (64 MB); mmap_size is in bytes (256 MB).
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+def _connect():
+    # cached_statements keeps prepared statements alive for the lifetime of
+    # the connection, so repeated queries skip the parse/plan step.
+    conn = sqlite3.connect(
+        DATABASE,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections shared across requests"""
+
+    def __init__(self, size=POOL_SIZE):
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return _connect()
+
+    def release(self, conn):
+        # Never hand out a connection with a half-finished transaction
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+pool = ConnectionPool()
+_local = threading.local()
+
+def get_db():
+    """Return the connection bound to the current app context or thread.
+
+    Inside a request the connection is checked out of the pool once and
+    returned by close_db() on teardown. Outside an app context (init_db,
+    scripts) each thread keeps its own persistent connection.
+    """
+    if has_app_context():
+        if 'db' not in g:
+            g.db = pool.acquire()
+        return g.db
+
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = _connect()
     return conn
 
+def close_db(e=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        pool.release(conn)
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
+
+# Schema changes applied on top of the base tables created by init_db().
+# Each entry upgrades the database by one version and PRAGMA user_version
+# records the last one applied, so append new migrations and never edit
+# ones that have already shipped.
+MIGRATIONS = [
+    # 1: secondary indexes for the deck, due-card and quiz history queries
+    [
+        'CREATE INDEX IF NOT EXISTS idx_cards_deck_created ON cards (deck_id, created_at)',
+        # Older databases may hold duplicate session rows; keep the first one
+        '''
+            DELETE FROM study_sessions
+            WHERE id NOT IN (SELECT MIN(id) FROM study_sessions GROUP BY card_id)
+        ''',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_study_sessions_card ON study_sessions (card_id)',
+        'CREATE INDEX IF NOT EXISTS idx_study_sessions_next_review ON study_sessions (next_review)',
+        'CREATE INDEX IF NOT EXISTS idx_quiz_results_deck_completed ON quiz_results (deck_id, completed_at)',
+    ],
+    # 2: single-row activity counters kept current by triggers, so badge
+    #    rules never have to rescan study or quiz history
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS user_stats (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                cards_studied INTEGER NOT NULL DEFAULT 0,
+                quizzes_completed INTEGER NOT NULL DEFAULT 0,
+                perfect_scores INTEGER NOT NULL DEFAULT 0,
+                current_streak INTEGER NOT NULL DEFAULT 0,
+                last_study_date DATE
+            )
+        ''',
+        # Backfill from existing history. Past streaks cannot be rebuilt
+        # because only the latest review per card is stored.
+        '''
+            INSERT OR IGNORE INTO user_stats
+                (id, cards_studied, quizzes_completed, perfect_scores, current_streak, last_study_date)
+            SELECT 1,
+                (SELECT COUNT(*) FROM study_sessions WHERE last_reviewed IS NOT NULL),
+                (SELECT COUNT(*) FROM quiz_results),
+                (SELECT COUNT(*) FROM quiz_results WHERE score = total),
+                (SELECT COUNT(*) > 0 FROM study_sessions WHERE last_reviewed IS NOT NULL),
+                (SELECT date(MAX(last_reviewed)) FROM study_sessions)
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_study_sessions_first_review
+            AFTER UPDATE OF last_reviewed ON study_sessions
+            WHEN OLD.last_reviewed IS NULL AND NEW.last_reviewed IS NOT NULL
+            BEGIN
+                UPDATE user_stats SET cards_studied = cards_studied + 1 WHERE id = 1;
+            END
+        ''',
+        # Reviews dated on or before the last study day (e.g. replayed
+        # offline reviews) leave the streak alone
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_study_sessions_streak
+            AFTER UPDATE OF last_reviewed ON study_sessions
+            WHEN NEW.last_reviewed IS NOT NULL
+            BEGIN
+                UPDATE user_stats
+                SET current_streak = CASE
+                        WHEN last_study_date IS NULL THEN 1
+                        WHEN last_study_date >= date(NEW.last_reviewed) THEN current_streak
+                        WHEN last_study_date = date(NEW.last_reviewed, '-1 day') THEN current_streak + 1
+                        ELSE 1
+                    END,
+                    last_study_date = CASE
+                        WHEN last_study_date IS NULL OR last_study_date < date(NEW.last_reviewed)
+                        THEN date(NEW.last_reviewed)
+                        ELSE last_study_date
+                    END
+                WHERE id = 1;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_quiz_results_insert
+            AFTER INSERT ON quiz_results
+            BEGIN
+                UPDATE user_stats
+                SET quizzes_completed = quizzes_completed + 1,
+                    perfect_scores = perfect_scores + (NEW.score = NEW.total)
+                WHERE id = 1;
+            END
+        ''',
+    ],
+    # 3: per-deck content version, bumped by triggers whenever a card or its
+    #    study state changes, for use in HTTP validators
+    [
+        'ALTER TABLE decks ADD COLUMN version INTEGER NOT NULL DEFAULT 0',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_cards_insert_version
+            AFTER INSERT ON cards
+            BEGIN
+                UPDATE decks SET version = version + 1 WHERE id = NEW.deck_id;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_cards_update_version
+            AFTER UPDATE ON cards
+            BEGIN
+                UPDATE decks SET version = version + 1 WHERE id IN (OLD.deck_id, NEW.deck_id);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_cards_delete_version
+            AFTER DELETE ON cards
+            BEGIN
+                UPDATE decks SET version = version + 1 WHERE id = OLD.deck_id;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_study_sessions_version
+            AFTER UPDATE ON study_sessions
+            BEGIN
+                UPDATE decks SET version = version + 1
+                WHERE id = (SELECT deck_id FROM cards WHERE id = NEW.card_id);
+            END
+        ''',
+    ],
+    # 4: content-addressed store for AI generation results, see ai_cache.py
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS ai_cache (
+                key TEXT PRIMARY KEY,
+                action TEXT NOT NULL,
+                result TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache (last_used_at)',
+    ],
+    # 5: background job queue, see jobs.py
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                payload TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                message TEXT,
+                result TEXT,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, updated_at)',
+    ],
+    # 6: compressed text extracted from uploaded PDFs, see pdf_cache.py
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS pdf_text_cache (
+                key TEXT PRIMARY KEY,
+                text BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_pdf_text_cache_last_used ON pdf_text_cache (last_used_at)',
+    ],
+    # 7: per-deck summary kept current by triggers, so listing decks never
+    #    scans cards. Cards with an interval of 21 days or more count as
+    #    mastered. due_count is exact until next_due_at, the earliest
+    #    next_review it has not counted yet; past that (or when next_due_at
+    #    is '') Deck.refresh_due_counts() recounts that deck.
+    [
+        '''
+            CREATE TABLE IF NOT EXISTS deck_stats (
+                deck_id INTEGER PRIMARY KEY,
+                card_count INTEGER NOT NULL DEFAULT 0,
+                due_count INTEGER NOT NULL DEFAULT 0,
+                mastered_count INTEGER NOT NULL DEFAULT 0,
+                last_studied_at TIMESTAMP,
+                next_due_at TIMESTAMP
+            )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_deck_stats_next_due ON deck_stats (next_due_at)',
+        'CREATE INDEX IF NOT EXISTS idx_decks_created ON decks (created_at)',
+        # Due counts are left for the first refresh to fill in
+        '''
+            INSERT OR IGNORE INTO deck_stats (deck_id, card_count, mastered_count, last_studied_at, next_due_at)
+            SELECT d.id,
+                (SELECT COUNT(*) FROM cards c WHERE c.deck_id = d.id),
+                (SELECT COUNT(*) FROM cards c JOIN study_sessions s ON s.card_id = c.id
+                 WHERE c.deck_id = d.id AND s.interval >= 21),
+                (SELECT MAX(s.last_reviewed) FROM cards c JOIN study_sessions s ON s.card_id = c.id
+                 WHERE c.deck_id = d.id),
+                ''
+            FROM decks d
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_decks_insert_stats
+            AFTER INSERT ON decks
+            BEGIN
+                INSERT OR IGNORE INTO deck_stats (deck_id) VALUES (NEW.id);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_decks_delete_stats
+            AFTER DELETE ON decks
+            BEGIN
+                DELETE FROM deck_stats WHERE deck_id = OLD.id;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_cards_insert_stats
+            AFTER INSERT ON cards
+            BEGIN
+                UPDATE deck_stats SET card_count = card_count + 1 WHERE deck_id = NEW.deck_id;
+            END
+        ''',
+        # BEFORE, so the card's study session can still be read
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_cards_delete_stats
+            BEFORE DELETE ON cards
+            BEGIN
+                UPDATE deck_stats
+                SET card_count = card_count - 1,
+                    mastered_count = mastered_count - COALESCE(
+                        (SELECT interval >= 21 FROM study_sessions WHERE card_id = OLD.id), 0),
+                    due_count = CASE
+                        WHEN next_due_at IS NULL OR next_due_at > CURRENT_TIMESTAMP
+                        THEN due_count - COALESCE(
+                            (SELECT next_review <= CURRENT_TIMESTAMP FROM study_sessions WHERE card_id = OLD.id), 0)
+                        ELSE due_count
+                    END
+                WHERE deck_id = OLD.deck_id;
+            END
+        ''',
+        # Moving a card between decks recounts due cards in both
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_cards_move_stats
+            AFTER UPDATE OF deck_id ON cards
+            WHEN OLD.deck_id != NEW.deck_id
+            BEGIN
+                UPDATE deck_stats
+                SET card_count = card_count - 1,
+                    mastered_count = mastered_count - COALESCE(
+                        (SELECT interval >= 21 FROM study_sessions WHERE card_id = NEW.id), 0),
+                    next_due_at = ''
+                WHERE deck_id = OLD.deck_id;
+                UPDATE deck_stats
+                SET card_count = card_count + 1,
+                    mastered_count = mastered_count + COALESCE(
+                        (SELECT interval >= 21 FROM study_sessions WHERE card_id = NEW.id), 0),
+                    next_due_at = ''
+                WHERE deck_id = NEW.deck_id;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_study_sessions_insert_stats
+            AFTER INSERT ON study_sessions
+            BEGIN
+                UPDATE deck_stats
+                SET mastered_count = mastered_count + (NEW.interval >= 21),
+                    last_studied_at = CASE
+                        WHEN NEW.last_reviewed > COALESCE(last_studied_at, '') THEN NEW.last_reviewed
+                        ELSE last_studied_at
+                    END,
+                    due_count = CASE
+                        WHEN next_due_at IS NULL OR next_due_at > CURRENT_TIMESTAMP
+                        THEN due_count + (NEW.next_review <= CURRENT_TIMESTAMP)
+                        ELSE due_count
+                    END,
+                    next_due_at = CASE
+                        WHEN (next_due_at IS NULL OR next_due_at > CURRENT_TIMESTAMP)
+                             AND NEW.next_review > CURRENT_TIMESTAMP
+                        THEN MIN(COALESCE(next_due_at, NEW.next_review), NEW.next_review)
+                        ELSE next_due_at
+                    END
+                WHERE deck_id = (SELECT deck_id FROM cards WHERE id = NEW.card_id);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_study_sessions_update_stats
+            AFTER UPDATE ON study_sessions
+            BEGIN
+                UPDATE deck_stats
+                SET mastered_count = mastered_count + (NEW.interval >= 21) - (OLD.interval >= 21),
+                    last_studied_at = CASE
+                        WHEN NEW.last_reviewed > COALESCE(last_studied_at, '') THEN NEW.last_reviewed
+                        ELSE last_studied_at
+                    END,
+                    due_count = CASE
+                        WHEN next_due_at IS NULL OR next_due_at > CURRENT_TIMESTAMP
+                        THEN due_count + (NEW.next_review <= CURRENT_TIMESTAMP)
+                                       - (OLD.next_review <= CURRENT_TIMESTAMP)
+                        ELSE due_count
+                    END,
+                    next_due_at = CASE
+                        WHEN (next_due_at IS NULL OR next_due_at > CURRENT_TIMESTAMP)
+                             AND NEW.next_review > CURRENT_TIMESTAMP
+                        THEN MIN(COALESCE(next_due_at, NEW.next_review), NEW.next_review)
+                        ELSE next_due_at
+                    END
+                WHERE deck_id = (SELECT deck_id FROM cards WHERE id = NEW.card_id);
+            END
+        ''',
+    ],
+    # 8: the process running a job, so jobs whose process died can be failed
+    [
+        'ALTER TABLE jobs ADD COLUMN owner TEXT',
+    ],
+    # 9: per-deck version of the cards alone, which reviews leave alone, for
+    #    artifacts rendered from card content (see pdf_exports.py). The card
+    #    triggers from 3 are recreated to bump both versions in one update.
+    [
+        'ALTER TABLE decks ADD COLUMN content_version INTEGER NOT NULL DEFAULT 0',
+        'UPDATE decks SET content_version = version',
+        'DROP TRIGGER IF EXISTS trg_cards_insert_version',
+        'DROP TRIGGER IF EXISTS trg_cards_update_version',
+        'DROP TRIGGER IF EXISTS trg_cards_delete_version',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_cards_insert_version
+            AFTER INSERT ON cards
+            BEGIN
+                UPDATE decks SET version = version + 1, content_version = content_version + 1
+                WHERE id = NEW.deck_id;
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_cards_update_version
+            AFTER UPDATE ON cards
+            BEGIN
+                UPDATE decks SET version = version + 1, content_version = content_version + 1
+                WHERE id IN (OLD.deck_id, NEW.deck_id);
+            END
+        ''',
+        '''
+            CREATE TRIGGER IF NOT EXISTS trg_cards_delete_version
+            AFTER DELETE ON cards
+            BEGIN
+                UPDATE decks SET version = version + 1, content_version = content_version + 1
+                WHERE id = OLD.deck_id;
+            END
+        ''',
+    ],
+    # 10: whether a job was given in-memory secrets (e.g. the user's API key),
+    #     which a restart loses
+    [
+        'ALTER TABLE jobs ADD COLUMN has_secrets INTEGER NOT NULL DEFAULT 0',
+    ],
+]
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(conn):
+    """Apply pending MIGRATIONS, one transaction per version"""
+    version = get_schema_version(conn)
+    if version >= len(MIGRATIONS):
+        return version
+
+    for target, statements in enumerate(MIGRATIONS[version:], version + 1):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    # Refresh planner statistics for the new indexes
+    conn.execute('PRAGMA optimize')
+    return len(MIGRATIONS)
+
 def init_db():
     conn = get_db()
     cursor = conn.cursor()
@@ -91,7 +546,21 @@ def init_db():
         ''', badges_data)
 
     conn.commit()
-    conn.close()
+
+    migrate(conn)
+
+# Cache keys for the read-heavy queries. Each write below invalidates
+# exactly the keys whose results it can change.
+DECKS_CACHE_KEY = 'decks:all'
+BADGES_CACHE_KEY = 'badges:all'
+STATS_CACHE_KEY = 'stats'
+# due_today moves with the clock, so stats are kept for less time
+STATS_CACHE_TTL = 30
+# Likewise the due counts in the deck list
+DECKS_CACHE_TTL = 30
+
+def deck_cards_cache_key(deck_id):
+    return f'deck:{deck_id}:cards'
 
 class Deck:
     @staticmethod
@@ -101,23 +570,55 @@ class Deck:
         cursor.execute('INSERT INTO decks (name, description) VALUES (?, ?)', (name, description))
         deck_id = cursor.lastrowid
         conn.commit()
-        conn.close()
+        invalidate(DECKS_CACHE_KEY)
         return deck_id
 
     @staticmethod
     def get_all():
+        def load():
+            Deck.refresh_due_counts()
+            conn = get_db()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT d.*,
+                    COALESCE(s.card_count, 0) AS card_count,
+                    COALESCE(s.due_count, 0) AS due_count,
+                    COALESCE(s.mastered_count, 0) AS mastered_count,
+                    s.last_studied_at
+                FROM decks d
+                LEFT JOIN deck_stats s ON s.deck_id = d.id
+                ORDER BY d.created_at DESC
+            ''')
+            return [dict(row) for row in cursor.fetchall()]
+
+        return get_or_set(DECKS_CACHE_KEY, load, DECKS_CACHE_TTL)
+
+    @staticmethod
+    def refresh_due_counts():
+        """
+        Recount due cards for decks where a card has become due since their
+        due_count was last exact. Only those decks' cards are read.
+        """
         conn = get_db()
         cursor = conn.cursor()
+        # Check with a read first so the common case takes no write lock
+        cursor.execute('SELECT 1 FROM deck_stats WHERE next_due_at <= CURRENT_TIMESTAMP LIMIT 1')
+        if cursor.fetchone() is None:
+            return
+
         cursor.execute('''
-            SELECT d.*, COUNT(c.id) as card_count
-            FROM decks d
-            LEFT JOIN cards c ON d.id = c.deck_id
-            GROUP BY d.id
-            ORDER BY d.created_at DESC
+            UPDATE deck_stats
+            SET due_count = (
+                    SELECT COUNT(*) FROM cards c JOIN study_sessions s ON s.card_id = c.id
+                    WHERE c.deck_id = deck_stats.deck_id AND s.next_review <= CURRENT_TIMESTAMP
+                ),
+                next_due_at = (
+                    SELECT MIN(s.next_review) FROM cards c JOIN study_sessions s ON s.card_id = c.id
+                    WHERE c.deck_id = deck_stats.deck_id AND s.next_review > CURRENT_TIMESTAMP
+                )
+            WHERE next_due_at <= CURRENT_TIMESTAMP
         ''')
-        decks = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return decks
+        conn.commit()
 
     @staticmethod
     def get_by_id(deck_id):
@@ -125,7 +626,6 @@ class Deck:
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM decks WHERE id = ?', (deck_id,))
         deck = cursor.fetchone()
-        conn.close()
         return dict(deck) if deck else None
 
     @staticmethod
@@ -134,7 +634,51 @@ class Deck:
         cursor = conn.cursor()
         cursor.execute('DELETE FROM decks WHERE id = ?', (deck_id,))
         conn.commit()
-        conn.close()
+        invalidate(DECKS_CACHE_KEY, deck_cards_cache_key(deck_id))
+
+def _normalize_choices(choices):
+    """Return choices as a JSON string, or None if missing or invalid"""
+    if not choices:
+        return None
+    if isinstance(choices, str):
+        # If it's already a string, try to parse and re-encode to ensure valid JSON
+        try:
+            return json.dumps(json.loads(choices))
+        except json.JSONDecodeError:
+            # If it's not valid JSON, treat as None
+            return None
+    if isinstance(choices, list):
+        return json.dumps(choices)
+    return None
+
+def _row_to_card(row):
+    card = dict(row)
+    if card['choices']:
+        try:
+            card['choices'] = json.loads(card['choices'])
+        except (json.JSONDecodeError, TypeError):
+            # If choices is invalid JSON, set to None
+            card['choices'] = None
+    return card
+
+def encode_cursor(*values):
+    """Pack keyset pagination values into an opaque URL-safe token"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Unpack a (timestamp, id) token from encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError('Invalid cursor')
+    timestamp, row_id = values
+    # bool is an int subclass but never a row id
+    if not isinstance(timestamp, str) or not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise ValueError('Invalid cursor')
+    return values
 
 class Card:
     @staticmethod
@@ -143,18 +687,7 @@ class Card:
         cursor = conn.cursor()
         
         # Ensure choices is properly formatted
-        choices_json = None
-        if choices:
-            if isinstance(choices, str):
-                # If it's already a string, try to parse and re-encode to ensure valid JSON
-                try:
-                    parsed = json.loads(choices)
-                    choices_json = json.dumps(parsed)
-                except json.JSONDecodeError:
-                    # If it's not valid JSON, treat as None
-                    choices_json = None
-            elif isinstance(choices, list):
-                choices_json = json.dumps(choices)
+        choices_json = _normalize_choices(choices)
         
         cursor.execute('''
             INSERT INTO cards (deck_id, question, answer, choices)
@@ -168,11 +701,86 @@ class Card:
         ''', (card_id,))
 
         conn.commit()
-        conn.close()
+        invalidate(DECKS_CACHE_KEY, deck_cards_cache_key(deck_id), STATS_CACHE_KEY)
         return card_id
 
+    @staticmethod
+    def create_many(deck_id, cards):
+        """
+        Insert many cards and their study sessions in a single transaction
+
+        Args:
+            deck_id: Deck the cards belong to
+            cards: Iterable of dicts with 'question', 'answer' and optional 'choices'
+
+        Returns:
+            list: New card ids, in the same order as the input
+
+        Raises:
+            ValueError: If any card is missing a question or answer
+        """
+        rows = []
+        for i, card in enumerate(cards, 1):
+            if not isinstance(card, dict) or not card.get('question') or not card.get('answer'):
+                raise ValueError(f"Card {i} is missing required fields")
+            rows.append((deck_id, card['question'], card['answer'], _normalize_choices(card.get('choices'))))
+
+        if not rows:
+            return []
+
+        conn = get_db()
+        cursor = conn.cursor()
+
+        # Take the write lock up front so no other writer can interleave ids
+        # between reading the high-water mark and inserting the batch.
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) FROM cards')
+            last_id = cursor.fetchone()[0]
+
+            cursor.executemany('''
+                INSERT INTO cards (deck_id, question, answer, choices)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+
+            cursor.execute('SELECT id FROM cards WHERE id > ? ORDER BY id', (last_id,))
+            card_ids = [row[0] for row in cursor.fetchall()]
+
+            cursor.executemany('''
+                INSERT INTO study_sessions (card_id)
+                VALUES (?)
+            ''', [(card_id,) for card_id in card_ids])
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        invalidate(DECKS_CACHE_KEY, deck_cards_cache_key(deck_id), STATS_CACHE_KEY)
+        return card_ids
+
     @staticmethod
     def get_by_deck(deck_id):
+        def load():
+            conn = get_db()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT c.*, s.easiness_factor, s.interval, s.repetitions, s.next_review
+                FROM cards c
+                LEFT JOIN study_sessions s ON c.id = s.card_id
+                WHERE c.deck_id = ?
+                ORDER BY c.created_at, c.id
+            ''', (deck_id,))
+            return [_row_to_card(row) for row in cursor.fetchall()]
+
+        return get_or_set(deck_cards_cache_key(deck_id), load)
+
+    @staticmethod
+    def iter_by_deck(deck_id, batch_size=500):
+        """
+        Yield a deck's cards in batches of up to batch_size, in get_by_deck
+        order, stepping the cursor instead of loading every row at once
+        """
         conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
@@ -180,18 +788,61 @@ class Card:
             FROM cards c
             LEFT JOIN study_sessions s ON c.id = s.card_id
             WHERE c.deck_id = ?
-            ORDER BY c.created_at
+            ORDER BY c.created_at, c.id
         ''', (deck_id,))
-        cards = [dict(row) for row in cursor.fetchall()]
-        for card in cards:
-            if card['choices']:
-                try:
-                    card['choices'] = json.loads(card['choices'])
-                except (json.JSONDecodeError, TypeError):
-                    # If choices is invalid JSON, set to None
-                    card['choices'] = None
-        conn.close()
-        return cards
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [_row_to_card(row) for row in rows]
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def get_page_by_deck(deck_id, limit, after=None):
+        """
+        Keyset-paginated version of get_by_deck
+
+        Args:
+            deck_id: Deck to read
+            limit: Maximum number of cards to return
+            after: next_cursor from the previous page, or None for the first page
+
+        Returns:
+            tuple: (cards, next_cursor), next_cursor is None on the last page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        conn = get_db()
+        cursor = conn.cursor()
+        if after:
+            created_at, card_id = decode_cursor(after)
+            cursor.execute('''
+                SELECT c.*, s.easiness_factor, s.interval, s.repetitions, s.next_review
+                FROM cards c
+                LEFT JOIN study_sessions s ON c.id = s.card_id
+                WHERE c.deck_id = ? AND (c.created_at, c.id) > (?, ?)
+                ORDER BY c.created_at, c.id
+                LIMIT ?
+            ''', (deck_id, created_at, card_id, limit + 1))
+        else:
+            cursor.execute('''
+                SELECT c.*, s.easiness_factor, s.interval, s.repetitions, s.next_review
+                FROM cards c
+                LEFT JOIN study_sessions s ON c.id = s.card_id
+                WHERE c.deck_id = ?
+                ORDER BY c.created_at, c.id
+                LIMIT ?
+            ''', (deck_id, limit + 1))
+        rows = cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
+        return [_row_to_card(row) for row in rows], next_cursor
 
     @staticmethod
     def get_due_cards(deck_id):
@@ -202,45 +853,96 @@ class Card:
             FROM cards c
             JOIN study_sessions s ON c.id = s.card_id
             WHERE c.deck_id = ? AND s.next_review <= CURRENT_TIMESTAMP
-            ORDER BY s.next_review
+            ORDER BY s.next_review, c.id
+        ''', (deck_id,))
+        return [_row_to_card(row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def get_due_page(deck_id, limit, after=None):
+        """
+        Next `limit` due cards in review order, resuming after a cursor
+
+        The cursor holds the (next_review, id) of the last card served, so
+        reviewing cards from earlier pages does not shift later pages.
+
+        Returns:
+            tuple: (cards, next_cursor), next_cursor is None on the last page
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        conn = get_db()
+        cursor = conn.cursor()
+        if after:
+            next_review, card_id = decode_cursor(after)
+            cursor.execute('''
+                SELECT c.*, s.easiness_factor, s.interval, s.repetitions, s.next_review
+                FROM cards c
+                JOIN study_sessions s ON c.id = s.card_id
+                WHERE c.deck_id = ? AND s.next_review <= CURRENT_TIMESTAMP
+                  AND (s.next_review, c.id) > (?, ?)
+                ORDER BY s.next_review, c.id
+                LIMIT ?
+            ''', (deck_id, next_review, card_id, limit + 1))
+        else:
+            cursor.execute('''
+                SELECT c.*, s.easiness_factor, s.interval, s.repetitions, s.next_review
+                FROM cards c
+                JOIN study_sessions s ON c.id = s.card_id
+                WHERE c.deck_id = ? AND s.next_review <= CURRENT_TIMESTAMP
+                ORDER BY s.next_review, c.id
+                LIMIT ?
+            ''', (deck_id, limit + 1))
+        rows = cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]['next_review'], rows[-1]['id'])
+        return [_row_to_card(row) for row in rows], next_cursor
+
+    @staticmethod
+    def count_due(deck_id):
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT COUNT(*)
+            FROM cards c
+            JOIN study_sessions s ON c.id = s.card_id
+            WHERE c.deck_id = ? AND s.next_review <= CURRENT_TIMESTAMP
         ''', (deck_id,))
-        cards = [dict(row) for row in cursor.fetchall()]
-        for card in cards:
-            if card['choices']:
-                try:
-                    card['choices'] = json.loads(card['choices'])
-                except (json.JSONDecodeError, TypeError):
-                    # If choices is invalid JSON, set to None
-                    card['choices'] = None
-        conn.close()
-        return cards
+        return cursor.fetchone()[0]
 
     @staticmethod
     def delete(card_id):
         conn = get_db()
         cursor = conn.cursor()
+        cursor.execute('SELECT deck_id FROM cards WHERE id = ?', (card_id,))
+        card = cursor.fetchone()
         cursor.execute('DELETE FROM cards WHERE id = ?', (card_id,))
         conn.commit()
-        conn.close()
+        if card:
+            invalidate(DECKS_CACHE_KEY, deck_cards_cache_key(card['deck_id']), STATS_CACHE_KEY)
 
 class StudySession:
     @staticmethod
     def update(card_id, quality):
-        from srs_algorithm import sm2_algorithm
+        from srs_algorithm import get_scheduler
 
         conn = get_db()
         cursor = conn.cursor()
 
         cursor.execute('''
-            SELECT easiness_factor, interval, repetitions
-            FROM study_sessions
-            WHERE card_id = ?
+            SELECT s.easiness_factor, s.interval, s.repetitions, c.deck_id
+            FROM study_sessions s
+            JOIN cards c ON c.id = s.card_id
+            WHERE s.card_id = ?
         ''', (card_id,))
         session = cursor.fetchone()
 
         if session:
-            ef, interval, reps = session
-            new_ef, new_interval, new_reps = sm2_algorithm(quality, ef, interval, reps)
+            ef, interval, reps, deck_id = session
+            new_ef, new_interval, new_reps = get_scheduler().schedule(quality, ef, interval, reps)
 
             cursor.execute('''
                 UPDATE study_sessions
@@ -253,30 +955,106 @@ class StudySession:
             ''', (new_ef, new_interval, new_reps, new_interval, card_id))
 
             conn.commit()
-
-        conn.close()
+            invalidate(DECKS_CACHE_KEY, deck_cards_cache_key(deck_id), STATS_CACHE_KEY)
 
     @staticmethod
-    def get_stats():
+    def update_many(reviews):
+        """
+        Apply a batch of reviews in one transaction
+
+        Args:
+            reviews: Iterable of (card_id, quality, reviewed_at) tuples, where
+                     reviewed_at is a naive UTC datetime or None for now
+
+        Returns:
+            int: Number of reviews applied (reviews of unknown cards are skipped)
+        """
+        from srs_algorithm import get_scheduler
+
+        now = datetime.utcnow()
+        reviews = sorted(
+            ((card_id, quality, reviewed_at or now) for card_id, quality, reviewed_at in reviews),
+            key=lambda review: review[2]
+        )
+        if not reviews:
+            return 0
+
         conn = get_db()
         cursor = conn.cursor()
 
-        cursor.execute('SELECT COUNT(*) FROM study_sessions WHERE last_reviewed IS NOT NULL')
-        total_studied = cursor.fetchone()[0]
+        # Hold the write lock so the states read below cannot go stale
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            # Current state of every card in the batch, chunked to stay under
+            # SQLite's bound-parameter limit
+            card_ids = list({review[0] for review in reviews})
+            states = {}
+            deck_ids = set()
+            for i in range(0, len(card_ids), 500):
+                chunk = card_ids[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'''
+                    SELECT s.card_id, s.easiness_factor, s.interval, s.repetitions, c.deck_id
+                    FROM study_sessions s
+                    JOIN cards c ON c.id = s.card_id
+                    WHERE s.card_id IN ({placeholders})
+                ''', chunk)
+                for row in cursor.fetchall():
+                    states[row[0]] = (row[1], row[2], row[3])
+                    deck_ids.add(row[4])
+
+            # Reviews of the same card are chained in reviewed_at order
+            scheduler = get_scheduler()
+            rows = []
+            for card_id, quality, reviewed_at in reviews:
+                if card_id not in states:
+                    continue
+                new_ef, new_interval, new_reps = scheduler.schedule(quality, *states[card_id])
+                states[card_id] = (new_ef, new_interval, new_reps)
+                reviewed_at = reviewed_at.strftime('%Y-%m-%d %H:%M:%S')
+                rows.append((new_ef, new_interval, new_reps, reviewed_at, new_interval, reviewed_at, card_id))
+
+            if rows:
+                cursor.executemany('''
+                    UPDATE study_sessions
+                    SET easiness_factor = ?,
+                        interval = ?,
+                        repetitions = ?,
+                        next_review = datetime(?, '+' || ? || ' days'),
+                        last_reviewed = ?
+                    WHERE card_id = ?
+                ''', rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        if rows:
+            invalidate(DECKS_CACHE_KEY, STATS_CACHE_KEY, *(deck_cards_cache_key(deck_id) for deck_id in deck_ids))
+        return len(rows)
+
+    @staticmethod
+    def get_stats():
+        def load():
+            conn = get_db()
+            cursor = conn.cursor()
 
-        cursor.execute('SELECT COUNT(*) FROM study_sessions WHERE next_review <= CURRENT_TIMESTAMP')
-        due_today = cursor.fetchone()[0]
+            cursor.execute('SELECT COUNT(*) FROM study_sessions WHERE last_reviewed IS NOT NULL')
+            total_studied = cursor.fetchone()[0]
 
-        cursor.execute('SELECT AVG(easiness_factor) FROM study_sessions WHERE last_reviewed IS NOT NULL')
-        avg_ef = cursor.fetchone()[0] or 0
+            cursor.execute('SELECT COUNT(*) FROM study_sessions WHERE next_review <= CURRENT_TIMESTAMP')
+            due_today = cursor.fetchone()[0]
 
-        conn.close()
+            cursor.execute('SELECT AVG(easiness_factor) FROM study_sessions WHERE last_reviewed IS NOT NULL')
+            avg_ef = cursor.fetchone()[0] or 0
 
-        return {
-            'total_studied': total_studied,
-            'due_today': due_today,
-            'average_retention': round(avg_ef, 2)
-        }
+            return {
+                'total_studied': total_studied,
+                'due_today': due_today,
+                'average_retention': round(avg_ef, 2)
+            }
+
+        return get_or_set(STATS_CACHE_KEY, load, STATS_CACHE_TTL)
 
 class QuizResult:
     @staticmethod
@@ -288,7 +1066,6 @@ class QuizResult:
             VALUES (?, ?, ?)
         ''', (deck_id, score, total))
         conn.commit()
-        conn.close()
 
     @staticmethod
     def get_by_deck(deck_id):
@@ -301,63 +1078,61 @@ class QuizResult:
             LIMIT 10
         ''', (deck_id,))
         results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
         return results
 
+# Counter in user_stats that each badge's requirement is measured against
+BADGE_COUNTERS = {
+    'First Steps': 'cards_studied',
+    'Beginner': 'cards_studied',
+    'Scholar': 'cards_studied',
+    'Expert': 'cards_studied',
+    'Master': 'cards_studied',
+    'Quiz Starter': 'quizzes_completed',
+    'Perfect Score': 'perfect_scores',
+    'Consistent Learner': 'current_streak',
+}
+
 class Badge:
     @staticmethod
     def check_and_award():
         conn = get_db()
         cursor = conn.cursor()
 
-        cursor.execute('SELECT COUNT(*) FROM study_sessions WHERE last_reviewed IS NOT NULL')
-        cards_studied = cursor.fetchone()[0]
+        cursor.execute('SELECT id, name, requirement FROM badges WHERE earned = 0')
+        unearned_badges = cursor.fetchall()
 
-        cursor.execute('SELECT COUNT(*) FROM quiz_results')
-        quizzes_completed = cursor.fetchone()[0]
+        # Nothing left to award, skip reading the counters at all
+        if not unearned_badges:
+            return []
 
-        cursor.execute('SELECT * FROM badges WHERE earned = 0')
-        unearned_badges = cursor.fetchall()
+        cursor.execute('SELECT * FROM user_stats WHERE id = 1')
+        stats = cursor.fetchone()
+        if stats is None:
+            return []
 
         newly_earned = []
         for badge in unearned_badges:
-            badge_dict = dict(badge)
-            if badge_dict['name'] in ['First Steps', 'Beginner', 'Scholar', 'Expert', 'Master']:
-                if cards_studied >= badge_dict['requirement']:
-                    cursor.execute('''
-                        UPDATE badges
-                        SET earned = 1, earned_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (badge_dict['id'],))
-                    newly_earned.append(badge_dict['name'])
-
-            elif badge_dict['name'] == 'Quiz Starter' and quizzes_completed >= 1:
-                cursor.execute('''
-                    UPDATE badges
-                    SET earned = 1, earned_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (badge_dict['id'],))
-                newly_earned.append(badge_dict['name'])
-
-            elif badge_dict['name'] == 'Perfect Score':
-                cursor.execute('SELECT * FROM quiz_results WHERE score = total LIMIT 1')
-                if cursor.fetchone():
-                    cursor.execute('''
-                        UPDATE badges
-                        SET earned = 1, earned_at = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (badge_dict['id'],))
-                    newly_earned.append(badge_dict['name'])
+            counter = BADGE_COUNTERS.get(badge['name'])
+            if counter and stats[counter] >= badge['requirement']:
+                newly_earned.append(badge)
 
-        conn.commit()
-        conn.close()
-        return newly_earned
+        if newly_earned:
+            cursor.executemany('''
+                UPDATE badges
+                SET earned = 1, earned_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', [(badge['id'],) for badge in newly_earned])
+            conn.commit()
+            invalidate(BADGES_CACHE_KEY)
+
+        return [badge['name'] for badge in newly_earned]
 
     @staticmethod
     def get_all():
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM badges ORDER BY requirement')
-        badges = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return badges
\ No newline at end of file
+        def load():
+            conn = get_db()
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM badges ORDER BY requirement')
+            return [dict(row) for row in cursor.fetchall()]
+
+        return get_or_set(BADGES_CACHE_KEY, load)
\ No newline at end of file
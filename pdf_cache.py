@@ -0,0 +1,25 @@
+import os
+import zlib
+
+from db_cache import CacheTable
+
+# Bump when extraction changes so text from the old extractor is not reused
+EXTRACTOR_VERSION = 1
+
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', 100 * 1024 * 1024))
+
+_table = CacheTable('pdf_text_cache', 'text', PDF_CACHE_MAX_BYTES)
+
+def cache_key(sha256):
+    """Key for a PDF identified by the SHA-256 of its bytes"""
+    return f'{EXTRACTOR_VERSION}:{sha256}'
+
+def get_cached_text(key):
+    """Return the extracted text stored for key, or None on a miss"""
+    compressed = _table.get(key)
+    return None if compressed is None else zlib.decompress(compressed).decode('utf-8')
+
+def store_text(key, text):
+    """Store extracted text compressed, evicting least recently used entries over the size cap"""
+    compressed = zlib.compress(text.encode('utf-8'), 6)
+    _table.put(key, compressed, len(compressed))
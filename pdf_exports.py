@@ -0,0 +1,135 @@
+import os
+import glob
+import hashlib
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from pdf_generator import generate_flashcards_pdf
+from process_pool import create_process_pool
+
+# Rendered deck PDFs are kept here and reused until the deck changes
+PDF_EXPORT_FOLDER = os.environ.get('PDF_EXPORT_FOLDER', 'exports')
+PDF_EXPORT_WORKERS = int(os.environ.get('PDF_EXPORT_WORKERS', 2))
+# How long a download waits for a render before asking the client to retry
+PDF_EXPORT_WAIT = float(os.environ.get('PDF_EXPORT_WAIT', 20))
+
+def _render(cards, deck_name, layout, path):
+    """Build one PDF in a worker process and move it into place atomically"""
+    buffer = generate_flashcards_pdf(cards, deck_name, layout)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(buffer.getbuffer())
+    os.replace(temp_path, path)
+    return path
+
+class PdfExporter:
+    """
+    Renders deck PDFs in worker processes and keeps the results on disk
+
+    ReportLab is pure Python, so renders run in a process pool rather than
+    holding the GIL in request threads. Concurrent requests for the same
+    artifact share one render. Once a render finishes, the deck's artifacts
+    for older versions and names are deleted.
+    """
+
+    def __init__(self, folder=PDF_EXPORT_FOLDER, workers=PDF_EXPORT_WORKERS):
+        self.folder = folder
+        self.workers = workers
+        self._pool = None
+        self._pending = {}
+        # Pending renders of deleted decks, whose output is removed on arrival
+        self._discarded = set()
+        self._lock = threading.Lock()
+        os.makedirs(folder, exist_ok=True)
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = create_process_pool(self.workers)
+        return self._pool
+
+    def _deck_prefix(self, deck_id):
+        return os.path.join(self.folder, f'deck-{deck_id}-v')
+
+    def artifact_path(self, deck, layout):
+        """
+        Where a deck's rendered PDF lives
+
+        The deck's content_version changes whenever its cards do (but not
+        when they are studied) and its name is printed in the PDF, so
+        together with the layout they identify the content.
+        """
+        name_hash = hashlib.sha256(deck['name'].encode('utf-8')).hexdigest()[:12]
+        return f"{self._deck_prefix(deck['id'])}{deck['content_version']}-{name_hash}-{layout}.pdf"
+
+    def open(self, deck, layout):
+        """Return the rendered PDF opened for reading, or None if it isn't ready"""
+        try:
+            return open(self.artifact_path(deck, layout), 'rb')
+        except FileNotFoundError:
+            return None
+
+    def render(self, deck, layout, cards):
+        """
+        Start rendering a deck's PDF unless it is already being rendered
+
+        Returns a future resolving to the artifact path.
+        """
+        path = self.artifact_path(deck, layout)
+        with self._lock:
+            future = self._pending.get(path)
+            if future is not None:
+                return future
+            try:
+                future = self._get_pool().submit(_render, cards, deck['name'], layout, path)
+            except BrokenProcessPool:
+                # A worker died; start over with a fresh pool
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+                future = self._get_pool().submit(_render, cards, deck['name'], layout, path)
+            self._pending[path] = future
+        future.add_done_callback(lambda f: self._finished(deck, path, f))
+        return future
+
+    def _finished(self, deck, path, future):
+        with self._lock:
+            self._pending.pop(path, None)
+            if path in self._discarded:
+                self._discarded.discard(path)
+                if not future.cancelled() and future.exception() is None:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                return
+            if not future.cancelled() and future.exception() is None:
+                # Older versions of this deck can never be served again; the
+                # current one may still be wanted in other layouts
+                current = path.rsplit('-', 1)[0] + '-'
+                self._remove(deck['id'], lambda version, stale: (
+                    version < deck['content_version']
+                    or (version == deck['content_version'] and not stale.startswith(current))
+                ))
+
+    def _remove(self, deck_id, should_remove):
+        prefix = self._deck_prefix(deck_id)
+        for stale in glob.glob(glob.escape(prefix) + '*.pdf'):
+            version = stale[len(prefix):].split('-', 1)[0]
+            if not version.isdigit() or not should_remove(int(version), stale):
+                continue
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+    def invalidate(self, deck_id):
+        """Delete every rendered PDF of a deck, including renders still in progress"""
+        prefix = self._deck_prefix(deck_id)
+        with self._lock:
+            pending = [future for path, future in self._pending.items() if path.startswith(prefix)]
+            # _finished removes whatever these renders write
+            self._discarded.update(path for path in self._pending if path.startswith(prefix))
+            self._remove(deck_id, lambda version, stale: True)
+        # Outside the lock: cancelling runs _finished straight away
+        for future in pending:
+            future.cancel()
+
+exporter = PdfExporter()
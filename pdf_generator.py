@@ -1,13 +1,133 @@
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
+from reportlab.platypus import (SimpleDocTemplate, BaseDocTemplate, PageTemplate, Frame, Paragraph,
+                                Spacer, PageBreak, Table, TableStyle, KeepInFrame, FrameBreak,
+                                NextPageTemplate)
+from reportlab.platypus.flowables import HRFlowable
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from io import BytesIO
 from datetime import datetime
 import html
 
+# Styles are immutable once built, so they are shared by every export
+styles = getSampleStyleSheet()
+
+title_style = ParagraphStyle(
+    'CustomTitle',
+    parent=styles['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#6366f1'),
+    spaceAfter=30,
+    alignment=TA_CENTER,
+    fontName='Helvetica-Bold'
+)
+
+heading_style = ParagraphStyle(
+    'CustomHeading',
+    parent=styles['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#4f46e5'),
+    spaceAfter=12,
+    spaceBefore=20,
+    fontName='Helvetica-Bold'
+)
+
+question_style = ParagraphStyle(
+    'Question',
+    parent=styles['Normal'],
+    fontSize=12,
+    textColor=colors.HexColor('#1f2937'),
+    spaceAfter=8,
+    leftIndent=20,
+    fontName='Helvetica-Bold'
+)
+
+answer_style = ParagraphStyle(
+    'Answer',
+    parent=styles['Normal'],
+    fontSize=11,
+    textColor=colors.HexColor('#374151'),
+    spaceAfter=12,
+    leftIndent=20,
+    fontName='Helvetica'
+)
+
+choice_style = ParagraphStyle(
+    'Choice',
+    parent=styles['Normal'],
+    fontSize=10,
+    textColor=colors.HexColor('#4b5563'),
+    spaceAfter=4,
+    leftIndent=30,
+    fontName='Helvetica'
+)
+
+cutout_label_style = ParagraphStyle(
+    'CutoutLabel',
+    parent=styles['Normal'],
+    fontSize=8,
+    textColor=colors.HexColor('#9ca3af'),
+    alignment=TA_CENTER,
+    fontName='Helvetica'
+)
+
+cutout_text_style = ParagraphStyle(
+    'CutoutText',
+    parent=styles['Normal'],
+    fontSize=11,
+    leading=14,
+    textColor=colors.HexColor('#1f2937'),
+    alignment=TA_CENTER,
+    fontName='Helvetica'
+)
+
+cutout_choice_style = ParagraphStyle(
+    'CutoutChoice',
+    parent=cutout_text_style,
+    fontSize=9,
+    leading=11,
+    alignment=TA_LEFT
+)
+
+# Flowables keep layout state from wrapping and drawing, so the fixed
+# content below is built fresh for every use rather than shared
+SMALL_GAP = 0.1*inch
+CARD_GAP = 0.15*inch
+SECTION_GAP = 0.3*inch
+SEPARATOR_COLOR = colors.HexColor('#e5e7eb')
+
+def _gap(height):
+    return Spacer(1, height)
+
+def _separator():
+    return HRFlowable(width='100%', thickness=1, color=SEPARATOR_COLOR, spaceBefore=0, spaceAfter=0)
+
+def _label(text):
+    return Paragraph(f"<b>{text}</b>", question_style)
+
+PAGE_MARGINS = dict(rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+
+# Printable cut-out cards: a grid of fixed-size cells per sheet
+CUTOUT_COLUMNS = 2
+CUTOUT_ROWS = 5
+CUTOUT_MARGIN = 0.5*inch
+# Frames keep 6pt of padding on each side inside the page margins
+CUTOUT_CELL_WIDTH = (letter[0] - 2*CUTOUT_MARGIN - 12) / CUTOUT_COLUMNS
+CUTOUT_CELL_HEIGHT = (letter[1] - 2*CUTOUT_MARGIN - 12) / CUTOUT_ROWS
+CUTOUT_PADDING = 10
+CUTOUT_GRID_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#9ca3af'), None, (3, 3)),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LEFTPADDING', (0, 0), (-1, -1), CUTOUT_PADDING),
+    ('RIGHTPADDING', (0, 0), (-1, -1), CUTOUT_PADDING),
+    ('TOPPADDING', (0, 0), (-1, -1), CUTOUT_PADDING),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), CUTOUT_PADDING),
+])
+
+LAYOUTS = ('list', 'columns', 'cutout')
+
 def escape_for_pdf(text):
     """Escape HTML and special characters for safe PDF rendering"""
     if text is None:
@@ -17,13 +137,177 @@ def escape_for_pdf(text):
     text = html.escape(text)
     return text
 
-def generate_flashcards_pdf(cards, deck_name="Flashcards"):
+def _validate_cards(cards):
+    if not cards or not isinstance(cards, list):
+        raise ValueError("Cards must be a non-empty list")
+    
+    for i, card in enumerate(cards, 1):
+        if not isinstance(card, dict):
+            raise ValueError(f"Card {i} is not a valid dictionary")
+        
+        if 'question' not in card or 'answer' not in card:
+            raise ValueError(f"Card {i} is missing required fields")
+
+def _card_choices(card):
+    choices = card.get('choices')
+    if choices and isinstance(choices, list):
+        # Limit to 10 choices max
+        return [str(choice).strip() for choice in choices[:10] if choice]
+    return None
+
+def _choice_paragraphs(card, choices, style):
+    # Compare original values before escaping
+    original_answer = str(card.get('answer', '')).strip()
+    paragraphs = []
+    for j, choice in enumerate(choices):
+        choice_letter = chr(65 + j)  # A, B, C, D
+        safe_choice = escape_for_pdf(choice)
+        if choice == original_answer:
+            paragraphs.append(Paragraph(f"<b>{choice_letter}. {safe_choice} ✓ (Correct)</b>", style))
+        else:
+            paragraphs.append(Paragraph(f"{choice_letter}. {safe_choice}", style))
+    return paragraphs
+
+def _title_flowables(deck_name):
+    # Title - escape deck name
+    safe_deck_name = escape_for_pdf(deck_name)
+    return [
+        Paragraph(f"📚 {safe_deck_name}", title_style),
+        Paragraph(f"Generated on {datetime.now().strftime('%B %d, %Y')}", styles['Normal']),
+        _gap(SECTION_GAP),
+    ]
+
+def _card_flowables(number, card, last):
+    story = [
+        Paragraph(f"Card #{number}", heading_style),
+        _label('Question:'),
+        # Question - escape user content
+        Paragraph(escape_for_pdf(card.get('question', 'No question')), answer_style),
+        _gap(SMALL_GAP),
+    ]
+    
+    choices = _card_choices(card)
+    if choices is not None:
+        story.append(_label('Answer Choices:'))
+        story.extend(_choice_paragraphs(card, choices, choice_style))
+    else:
+        story.append(_label('Answer:'))
+        story.append(Paragraph(escape_for_pdf(card.get('answer', 'No answer')), answer_style))
+    story.append(_gap(CARD_GAP))
+    
+    # Add separator line except for last card
+    if not last:
+        story.extend([_gap(SMALL_GAP), _separator(), _gap(CARD_GAP)])
+    return story
+
+def _list_story(cards, deck_name):
+    story = _title_flowables(deck_name)
+    for i, card in enumerate(cards, 1):
+        story.extend(_card_flowables(i, card, i == len(cards)))
+    
+    # Footer
+    story.append(_gap(SECTION_GAP))
+    story.append(Paragraph(f"Total Cards: {len(cards)} | AI Flashcard Generator", styles['Normal']))
+    return story
+
+def _build_list(buffer, cards, deck_name):
+    doc = SimpleDocTemplate(buffer, pagesize=letter, **PAGE_MARGINS)
+    doc.build(_list_story(cards, deck_name))
+
+def _build_columns(buffer, cards, deck_name, columns=2, gutter=0.3*inch):
+    """Same content as the list layout, flowing down newspaper-style columns"""
+    doc = BaseDocTemplate(buffer, pagesize=letter, **PAGE_MARGINS)
+    column_width = (doc.width - gutter * (columns - 1)) / columns
+    title_height = 1.3*inch
+    
+    def column_frames(height):
+        return [Frame(doc.leftMargin + i * (column_width + gutter), doc.bottomMargin,
+                      column_width, height, id=f'col{i}')
+                for i in range(columns)]
+    
+    title_frame = Frame(doc.leftMargin, doc.bottomMargin + doc.height - title_height,
+                        doc.width, title_height, id='title')
+    doc.addPageTemplates([
+        PageTemplate(id='first', frames=[title_frame] + column_frames(doc.height - title_height)),
+        PageTemplate(id='later', frames=column_frames(doc.height)),
+    ])
+    
+    story = _list_story(cards, deck_name)
+    # Title and date fill the full-width frame; cards start in the first column
+    story[2:3] = [NextPageTemplate('later'), FrameBreak()]
+    doc.build(story)
+
+def _cutout_cell(label, flowables):
+    width = CUTOUT_CELL_WIDTH - 2*CUTOUT_PADDING
+    height = CUTOUT_CELL_HEIGHT - 2*CUTOUT_PADDING
+    # Shrink long text to fit instead of overflowing the card
+    return KeepInFrame(width, height, [Paragraph(label, cutout_label_style), _gap(SMALL_GAP)] + flowables,
+                       mode='shrink')
+
+def _cutout_grid(cells):
+    rows = [cells[i:i + CUTOUT_COLUMNS] for i in range(0, len(cells), CUTOUT_COLUMNS)]
+    table = Table(rows, colWidths=[CUTOUT_CELL_WIDTH] * CUTOUT_COLUMNS,
+                  rowHeights=[CUTOUT_CELL_HEIGHT] * len(rows))
+    table.setStyle(CUTOUT_GRID_STYLE)
+    return table
+
+def _build_cutout(buffer, cards, deck_name):
+    """
+    Printable cards: each sheet of questions is followed by a sheet of the
+    matching answers, mirrored left to right so they line up when printed
+    double-sided (flip on long edge) and cut along the dashed lines
+    """
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=CUTOUT_MARGIN,
+                            leftMargin=CUTOUT_MARGIN, topMargin=CUTOUT_MARGIN,
+                            bottomMargin=CUTOUT_MARGIN, title=deck_name)
+    per_sheet = CUTOUT_COLUMNS * CUTOUT_ROWS
+    empty = ''
+    story = []
+    
+    for start in range(0, len(cards), per_sheet):
+        sheet = cards[start:start + per_sheet]
+        fronts = []
+        backs = []
+        for number, card in enumerate(sheet, start + 1):
+            front = [Paragraph(escape_for_pdf(card.get('question', 'No question')), cutout_text_style)]
+            choices = _card_choices(card)
+            if choices is not None:
+                front.append(_gap(SMALL_GAP))
+                front.extend(Paragraph(f"{chr(65 + j)}. {escape_for_pdf(choice)}", cutout_choice_style)
+                             for j, choice in enumerate(choices))
+            fronts.append(_cutout_cell(f"{escape_for_pdf(deck_name)} · #{number}", front))
+            backs.append(_cutout_cell(
+                f"Answer #{number}",
+                [Paragraph(escape_for_pdf(card.get('answer', 'No answer')), cutout_text_style)]
+            ))
+        
+        fronts += [empty] * (per_sheet - len(fronts))
+        backs += [empty] * (per_sheet - len(backs))
+        mirrored = []
+        for row in range(CUTOUT_ROWS):
+            mirrored.extend(reversed(backs[row * CUTOUT_COLUMNS:(row + 1) * CUTOUT_COLUMNS]))
+        
+        if story:
+            story.append(PageBreak())
+        story.extend([_cutout_grid(fronts), PageBreak(), _cutout_grid(mirrored)])
+    
+    doc.build(story)
+
+BUILDERS = {
+    'list': _build_list,
+    'columns': _build_columns,
+    'cutout': _build_cutout,
+}
+
+def generate_flashcards_pdf(cards, deck_name="Flashcards", layout='list'):
     """
     Generate a PDF from flashcards data
     
     Args:
         cards: List of dicts with 'question', 'answer', and optional 'choices'
         deck_name: Name of the flashcard deck
+        layout: 'list' (one card after another), 'columns' (two-column
+                list) or 'cutout' (printable double-sided cards)
     
     Returns:
         BytesIO object containing the PDF
@@ -32,150 +316,12 @@ def generate_flashcards_pdf(cards, deck_name="Flashcards"):
         ValueError: If cards data is invalid
         Exception: If PDF generation fails
     """
-    if not cards or not isinstance(cards, list):
-        raise ValueError("Cards must be a non-empty list")
+    _validate_cards(cards)
     
-    if len(cards) > 100:
-        raise ValueError("Cannot export more than 100 cards at once")
+    if layout not in BUILDERS:
+        raise ValueError(f"Unknown layout: {layout}")
     
     buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter,
-                           rightMargin=72, leftMargin=72,
-                           topMargin=72, bottomMargin=18)
-    
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        textColor=colors.HexColor('#6366f1'),
-        spaceAfter=30,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=16,
-        textColor=colors.HexColor('#4f46e5'),
-        spaceAfter=12,
-        spaceBefore=20,
-        fontName='Helvetica-Bold'
-    )
-    
-    question_style = ParagraphStyle(
-        'Question',
-        parent=styles['Normal'],
-        fontSize=12,
-        textColor=colors.HexColor('#1f2937'),
-        spaceAfter=8,
-        leftIndent=20,
-        fontName='Helvetica-Bold'
-    )
-    
-    answer_style = ParagraphStyle(
-        'Answer',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#374151'),
-        spaceAfter=12,
-        leftIndent=20,
-        fontName='Helvetica'
-    )
-    
-    choice_style = ParagraphStyle(
-        'Choice',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.HexColor('#4b5563'),
-        spaceAfter=4,
-        leftIndent=30,
-        fontName='Helvetica'
-    )
-    
-    story = []
-    
-    # Title - escape deck name
-    safe_deck_name = escape_for_pdf(deck_name)
-    story.append(Paragraph(f"📚 {safe_deck_name}", title_style))
-    story.append(Paragraph(f"Generated on {datetime.now().strftime('%B %d, %Y')}", styles['Normal']))
-    story.append(Spacer(1, 0.3*inch))
-    
-    # Add cards
-    valid_card_count = 0
-    for i, card in enumerate(cards, 1):
-        if not isinstance(card, dict):
-            raise ValueError(f"Card {i} is not a valid dictionary")
-        
-        if 'question' not in card or 'answer' not in card:
-            raise ValueError(f"Card {i} is missing required fields")
-        
-        valid_card_count += 1
-        
-        # Card number
-        card_header = f"Card #{valid_card_count}"
-        story.append(Paragraph(card_header, heading_style))
-        
-        # Question - escape user content
-        question = escape_for_pdf(card.get('question', 'No question'))
-        story.append(Paragraph("<b>Question:</b>", question_style))
-        story.append(Paragraph(question, answer_style))
-        story.append(Spacer(1, 0.1*inch))
-        
-        # Check if it's a multiple choice question
-        if 'choices' in card and card['choices'] and isinstance(card['choices'], list):
-            # Multiple choice - compare original values before escaping
-            original_answer = str(card.get('answer', '')).strip()
-            story.append(Paragraph("<b>Answer Choices:</b>", question_style))
-            
-            for j, choice in enumerate(card['choices'][:10]):  # Limit to 10 choices max
-                if not choice:
-                    continue
-                
-                # Convert choice to string for comparison
-                choice_str = str(choice).strip()
-                choice_letter = chr(65 + j)  # A, B, C, D
-                safe_choice = escape_for_pdf(choice_str)
-                # Compare original values
-                is_correct = choice_str == original_answer
-                
-                if is_correct:
-                    choice_text = f"<b>{choice_letter}. {safe_choice} ✓ (Correct)</b>"
-                    choice_para = Paragraph(choice_text, choice_style)
-                else:
-                    choice_text = f"{choice_letter}. {safe_choice}"
-                    choice_para = Paragraph(choice_text, choice_style)
-                
-                story.append(choice_para)
-            
-            story.append(Spacer(1, 0.15*inch))
-        else:
-            # Regular Q&A - escape user content
-            answer = escape_for_pdf(card.get('answer', 'No answer'))
-            story.append(Paragraph("<b>Answer:</b>", question_style))
-            story.append(Paragraph(answer, answer_style))
-            story.append(Spacer(1, 0.15*inch))
-        
-        # Add separator line except for last card
-        if i < len(cards):
-            story.append(Spacer(1, 0.1*inch))
-            # Horizontal line
-            line_table = Table([['']], colWidths=[6.5*inch])
-            line_table.setStyle(TableStyle([
-                ('LINEBELOW', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb'))
-            ]))
-            story.append(line_table)
-            story.append(Spacer(1, 0.15*inch))
-    
-    # Footer
-    story.append(Spacer(1, 0.3*inch))
-    footer_text = f"Total Cards: {len(cards)} | AI Flashcard Generator"
-    story.append(Paragraph(footer_text, styles['Normal']))
-    
-    # Build PDF
-    doc.build(story)
+    BUILDERS[layout](buffer, cards, deck_name)
     buffer.seek(0)
     return buffer
@@ -0,0 +1,19 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# How worker processes are started. fork is not offered: forking a threaded
+# server copies locks other threads hold, which can deadlock the child.
+# forkserver and spawn workers import the modules they need afresh (and the
+# main module, minus its __main__ block).
+PROCESS_START_METHOD = os.environ.get('PROCESS_START_METHOD', 'forkserver')
+
+if PROCESS_START_METHOD not in ('forkserver', 'spawn'):
+    raise ValueError("PROCESS_START_METHOD must be 'forkserver' or 'spawn'")
+
+def create_process_pool(workers):
+    """ProcessPoolExecutor for CPU-bound work, safe to create from any thread"""
+    method = PROCESS_START_METHOD
+    if method not in multiprocessing.get_all_start_methods():
+        method = 'spawn'
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
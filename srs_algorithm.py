@@ -1,3 +1,5 @@
+import numpy as np
+
 def sm2_algorithm(quality, easiness_factor=2.5, interval=0, repetitions=0):
     """
     SM-2 Spaced Repetition Algorithm
@@ -17,26 +19,156 @@ def sm2_algorithm(quality, easiness_factor=2.5, interval=0, repetitions=0):
     Returns:
         tuple: (new_easiness_factor, new_interval, new_repetitions)
     """
-    
-    if quality < 0 or quality > 5:
-        quality = max(0, min(5, quality))
-    
-    new_ef = easiness_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
-    
-    if new_ef < 1.3:
-        new_ef = 1.3
-    
-    if quality < 3:
-        new_repetitions = 0
-        new_interval = 1
-    else:
-        if repetitions == 0:
-            new_interval = 1
-        elif repetitions == 1:
-            new_interval = 6
+    return DEFAULT_SCHEDULER.schedule(quality, easiness_factor, interval, repetitions)
+
+class Scheduler:
+    """
+    Base class for spaced repetition schedulers
+
+    Subclasses implement schedule() for a single review. schedule_batch()
+    falls back to calling it in a loop; override it with a vectorized
+    version when the algorithm allows.
+    """
+
+    name = None
+
+    def schedule(self, quality, easiness_factor=2.5, interval=0, repetitions=0):
+        raise NotImplementedError
+
+    def schedule_batch(self, quality, easiness_factor, interval, repetitions):
+        """
+        Schedule many reviews at once
+
+        Args:
+            quality, easiness_factor, interval, repetitions: Array-likes of
+                equal length (scalars are broadcast)
+
+        Returns:
+            tuple: (new_easiness_factors, new_intervals, new_repetitions) as
+                   NumPy arrays
+        """
+        quality, easiness_factor, interval, repetitions = np.broadcast_arrays(
+            quality, easiness_factor, interval, repetitions
+        )
+        results = [
+            self.schedule(q, ef, i, r)
+            for q, ef, i, r in zip(quality.tolist(), easiness_factor.tolist(),
+                                   interval.tolist(), repetitions.tolist())
+        ]
+        if not results:
+            return (np.empty(0, dtype=np.float64), np.empty(0, dtype=np.int64),
+                    np.empty(0, dtype=np.int64))
+        new_ef, new_interval, new_reps = zip(*results)
+        return (np.asarray(new_ef, dtype=np.float64),
+                np.asarray(new_interval, dtype=np.int64),
+                np.asarray(new_reps, dtype=np.int64))
+
+class SM2Scheduler(Scheduler):
+    """SM-2 with tunable constants; the defaults are the published values"""
+
+    name = 'sm2'
+
+    def __init__(self, min_easiness_factor=1.3, first_interval=1, second_interval=6):
+        self.min_easiness_factor = min_easiness_factor
+        self.first_interval = first_interval
+        self.second_interval = second_interval
+
+    def schedule(self, quality, easiness_factor=2.5, interval=0, repetitions=0):
+        if quality < 0 or quality > 5:
+            quality = max(0, min(5, quality))
+
+        new_ef = easiness_factor + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+        if new_ef < self.min_easiness_factor:
+            new_ef = self.min_easiness_factor
+
+        if quality < 3:
+            new_repetitions = 0
+            new_interval = self.first_interval
         else:
-            new_interval = round(interval * new_ef)
-        
-        new_repetitions = repetitions + 1
-    
-    return new_ef, new_interval, new_repetitions
+            if repetitions == 0:
+                new_interval = self.first_interval
+            elif repetitions == 1:
+                new_interval = self.second_interval
+            else:
+                new_interval = round(interval * new_ef)
+
+            new_repetitions = repetitions + 1
+
+        return new_ef, new_interval, new_repetitions
+
+    def schedule_batch(self, quality, easiness_factor, interval, repetitions):
+        quality = np.clip(np.asarray(quality, dtype=np.float64), 0, 5)
+        easiness_factor = np.asarray(easiness_factor, dtype=np.float64)
+        interval = np.asarray(interval, dtype=np.int64)
+        repetitions = np.asarray(repetitions, dtype=np.int64)
+
+        lapse = 5 - quality
+        new_ef = easiness_factor + (0.1 - lapse * (0.08 + lapse * 0.02))
+        new_ef = np.maximum(new_ef, self.min_easiness_factor)
+
+        # np.rint rounds half to even, matching Python's round()
+        grown = np.rint(interval * new_ef).astype(np.int64)
+        passed_interval = np.where(
+            repetitions == 0, self.first_interval,
+            np.where(repetitions == 1, self.second_interval, grown)
+        )
+
+        passed = quality >= 3
+        new_interval = np.where(passed, passed_interval, self.first_interval).astype(np.int64)
+        new_reps = np.where(passed, repetitions + 1, 0).astype(np.int64)
+
+        return new_ef, new_interval, new_reps
+
+SCHEDULERS = {
+    SM2Scheduler.name: SM2Scheduler,
+}
+
+DEFAULT_SCHEDULER = SM2Scheduler()
+
+def get_scheduler(name=None, **params):
+    """Return the default scheduler, or a new one by name with custom parameters"""
+    if name is None and not params:
+        return DEFAULT_SCHEDULER
+    try:
+        scheduler_class = SCHEDULERS[name or DEFAULT_SCHEDULER.name]
+    except KeyError:
+        raise ValueError(f"Unknown scheduler: {name}")
+    return scheduler_class(**params)
+
+def forecast_due_counts(days_until_due, easiness_factor, interval, repetitions,
+                        days=30, quality=4, scheduler=None):
+    """
+    Simulate review load assuming every due card is answered with `quality`
+
+    Args:
+        days_until_due: Days until each card is next due (<= 0 means due today)
+        easiness_factor, interval, repetitions: Current state of each card
+        days: Number of days to simulate (default 30)
+        quality: Assumed answer quality for every review (default 4)
+        scheduler: Scheduler to use (default SM-2)
+
+    Returns:
+        numpy.ndarray: Number of reviews due on each simulated day
+    """
+    scheduler = scheduler or DEFAULT_SCHEDULER
+
+    due_in, ef, ivl, reps = np.broadcast_arrays(
+        days_until_due, easiness_factor, interval, repetitions
+    )
+    due_in = np.maximum(due_in.astype(np.int64), 0)
+    ef = ef.astype(np.float64)
+    ivl = ivl.astype(np.int64)
+    reps = reps.astype(np.int64)
+
+    counts = np.zeros(days, dtype=np.int64)
+    for day in range(days):
+        due = due_in == 0
+        counts[day] = np.count_nonzero(due)
+        if counts[day]:
+            ef[due], ivl[due], reps[due] = scheduler.schedule_batch(
+                quality, ef[due], ivl[due], reps[due]
+            )
+            due_in[due] = ivl[due]
+        due_in -= 1
+    return counts
@@ -5,6 +5,7 @@ let generatedCards = [];
 document.addEventListener('DOMContentLoaded', () => {
     setupTabs();
     setupFileUpload();
+    setupDeckImport();
     setupGenerateButton();
     loadDecks();
 });
@@ -58,19 +59,22 @@ function setupFileUpload() {
         showLoading(true);
         
         try {
-            const response = await fetch('/api/upload-pdf', {
+            const response = await fetch('/api/jobs/upload-pdf', {
                 method: 'POST',
                 body: formData
             });
             
-            const data = await response.json();
+            const job = await response.json();
             
-            if (response.ok) {
-                extractedText = data.text;
-                showMessage('PDF processed successfully! Text extracted: ' + data.text.length + ' characters', 'success');
-            } else {
-                showMessage(data.error || 'Error processing PDF', 'error');
+            if (!response.ok) {
+                showMessage(job.error || 'Error processing PDF', 'error');
+                return;
             }
+            
+            // Previously seen files come back at once instead of as a job
+            const data = response.status === 202 ? await waitForJob(job, updateLoadingMessage) : job;
+            extractedText = data.text;
+            showMessage('PDF processed successfully! Text extracted: ' + data.text.length + ' characters', 'success');
         } catch (error) {
             showMessage('Error uploading PDF: ' + error.message, 'error');
         } finally {
@@ -109,47 +113,19 @@ async function generateContent() {
     document.getElementById('summaryResult').classList.add('hidden');
     document.getElementById('cardsPreview').classList.add('hidden');
     
+    const request = {
+        text: text,
+        action: genType,
+        num_cards: numCards,
+        num_questions: numCards,
+        api_key: localStorage.getItem('gemini_api_key')
+    };
+    
     try {
-        const apiKey = localStorage.getItem('gemini_api_key');
-        
-        const response = await fetch('/api/process-text', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                text: text,
-                action: genType,
-                num_cards: numCards,
-                num_questions: numCards,
-                api_key: apiKey
-            })
-        });
-        
-        const data = await response.json();
-        
-        if (!response.ok) {
-            showMessage(data.error || 'Error generating content', 'error');
-            return;
-        }
-        
-        if (genType === 'summary') {
-            if (data.summary) {
-                // Format summary with paragraphs
-                const formattedSummary = data.summary.split('\n\n').map(para => 
-                    `<p class="summary-paragraph">${escapeHtml(para)}</p>`
-                ).join('');
-                document.getElementById('summaryContent').innerHTML = formattedSummary;
-                document.getElementById('summaryResult').classList.remove('hidden');
-            }
-        } else if (genType === 'flashcards') {
-            if (data.flashcards && Array.isArray(data.flashcards)) {
-                generatedCards = data.flashcards;
-                displayCardsPreview(generatedCards);
-            }
-        } else if (genType === 'multiple_choice') {
-            if (data.questions && Array.isArray(data.questions)) {
-                generatedCards = data.questions;
-                displayCardsPreview(generatedCards);
-            }
+        if (window.ReadableStream && window.TextDecoder) {
+            await generateStreaming(request);
+        } else {
+            await generateWithJob(request);
         }
         
         showMessage('Content generated successfully!', 'success');
@@ -160,6 +136,116 @@ async function generateContent() {
     }
 }
 
+// Show cards and summary text as the server streams them, so the first
+// results appear while the rest are still being generated
+async function generateStreaming(request) {
+    const response = await fetch('/api/process-text/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(request)
+    });
+    
+    if (!response.ok) {
+        const data = await response.json();
+        throw new Error(data.error || 'Error generating content');
+    }
+    
+    generatedCards = [];
+    let summary = '';
+    let finished = false;
+    
+    await readEventStream(response, (event, data) => {
+        if (event === 'card' || event === 'question') {
+            showLoading(false);
+            generatedCards.push(data);
+            displayCardsPreview(generatedCards);
+        } else if (event === 'summary') {
+            showLoading(false);
+            summary += data.text;
+            renderSummary(summary.split(/\n+/));
+        } else if (event === 'error') {
+            throw new Error(data.error);
+        } else if (event === 'done') {
+            finished = true;
+        }
+    });
+    
+    if (!finished) {
+        throw new Error('Connection lost before generation finished');
+    }
+}
+
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+        
+        for (const raw of events) {
+            let event = 'message';
+            let data = '';
+            for (const line of raw.split('\n')) {
+                if (line.startsWith('event: ')) {
+                    event = line.slice(7);
+                } else if (line.startsWith('data: ')) {
+                    data += line.slice(6);
+                }
+            }
+            if (data) {
+                onEvent(event, JSON.parse(data));
+            }
+        }
+    }
+}
+
+async function generateWithJob(request) {
+    const response = await fetch('/api/jobs/process-text', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(request)
+    });
+    
+    const job = await response.json();
+    
+    if (!response.ok) {
+        throw new Error(job.error || 'Error generating content');
+    }
+    
+    const data = await waitForJob(job, updateLoadingMessage);
+    
+    if (request.action === 'summary') {
+        if (data.summary) {
+            renderSummary(data.summary.split('\n\n'));
+        }
+    } else if (request.action === 'flashcards') {
+        if (data.flashcards && Array.isArray(data.flashcards)) {
+            generatedCards = data.flashcards;
+            displayCardsPreview(generatedCards);
+        }
+    } else if (request.action === 'multiple_choice') {
+        if (data.questions && Array.isArray(data.questions)) {
+            generatedCards = data.questions;
+            displayCardsPreview(generatedCards);
+        }
+    }
+}
+
+function renderSummary(paragraphs) {
+    // Format summary with paragraphs
+    document.getElementById('summaryContent').innerHTML = paragraphs
+        .filter(para => para.trim())
+        .map(para => `<p class="summary-paragraph">${escapeHtml(para)}</p>`)
+        .join('');
+    document.getElementById('summaryResult').classList.remove('hidden');
+}
+
 function displayCardsPreview(cards) {
     const container = document.getElementById('cardsContainer');
     
@@ -328,23 +414,26 @@ async function saveCards() {
         const deckData = await deckResponse.json();
         const deckId = deckData.id;
         
-        let savedCount = 0;
-        for (const card of generatedCards) {
-            const cardResponse = await fetch(`/api/decks/${deckId}/cards`, {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
+        const cardsResponse = await fetch(`/api/decks/${deckId}/cards/bulk`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                cards: generatedCards.map(card => ({
                     question: card.question,
                     answer: card.answer,
                     choices: card.choices || null
-                })
-            });
-            
-            if (cardResponse.ok) {
-                savedCount++;
-            }
+                }))
+            })
+        });
+        
+        const cardsData = await cardsResponse.json();
+        
+        if (!cardsResponse.ok) {
+            throw new Error(cardsData.error || 'Failed to save cards');
         }
         
+        const savedCount = cardsData.count;
+        
         showMessage(`Deck "${deckName}" created with ${savedCount} cards!`, 'success');
         
         document.getElementById('textInput').value = '';
@@ -364,11 +453,43 @@ async function saveCards() {
     }
 }
 
+function setupDeckImport() {
+    const importInput = document.getElementById('importInput');
+    importInput.addEventListener('change', async (e) => {
+        const file = e.target.files[0];
+        if (!file) return;
+        
+        const formData = new FormData();
+        formData.append('file', file);
+        
+        try {
+            showMessage('Importing deck...', 'info');
+            const response = await fetch('/api/decks/import', {
+                method: 'POST',
+                body: formData
+            });
+            const result = await response.json();
+            
+            if (!response.ok) {
+                throw new Error(result.error || 'Import failed');
+            }
+            
+            const skipped = result.skipped ? ` (${result.skipped} rows skipped)` : '';
+            showMessage(`Imported ${result.imported} cards${skipped}`, 'success');
+            await loadDecks();
+        } catch (error) {
+            showMessage('Error importing deck: ' + error.message, 'error');
+        } finally {
+            importInput.value = '';
+        }
+    });
+}
+
 async function loadDecks() {
     try {
-        // Add cache busting parameter to force fresh data
-        const response = await fetch('/api/decks?_t=' + Date.now(), {
-            cache: 'no-store'
+        // The server revalidates with ETags, so unchanged decks come back as 304
+        const response = await fetch('/api/decks', {
+            cache: 'no-cache'
         });
         const decks = await response.json();
         
@@ -385,6 +506,7 @@ async function loadDecks() {
                 <p>${escapeHtml(deck.description || 'No description')}</p>
                 <div class="deck-meta">
                     <span>📚 ${deck.card_count} cards</span>
+                    ${deck.due_count ? `<span>⏰ ${deck.due_count} due</span>` : ''}
                     <span>📅 ${new Date(deck.created_at).toLocaleDateString()}</span>
                 </div>
             </div>
@@ -394,11 +516,70 @@ async function loadDecks() {
     }
 }
 
+// Wait for a background job, following its progress over Server-Sent Events
+// and falling back to polling if the stream is unavailable or drops
+function waitForJob(job, onProgress) {
+    return new Promise((resolve, reject) => {
+        const finish = (data) => {
+            if (data.status === 'done') {
+                resolve(data.result);
+            } else {
+                reject(new Error(data.error || 'Job failed'));
+            }
+        };
+        
+        if (!('EventSource' in window)) {
+            pollJob(job.status_url, onProgress).then(finish, reject);
+            return;
+        }
+        
+        const source = new EventSource(job.events_url);
+        source.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (onProgress) onProgress(data);
+            if (data.status === 'done' || data.status === 'failed') {
+                source.close();
+                finish(data);
+            }
+        };
+        source.onerror = () => {
+            source.close();
+            pollJob(job.status_url, onProgress).then(finish, reject);
+        };
+    });
+}
+
+async function pollJob(statusUrl, onProgress) {
+    while (true) {
+        const response = await fetch(statusUrl);
+        const data = await response.json();
+        
+        if (!response.ok) {
+            throw new Error(data.error || 'Job not found');
+        }
+        
+        if (onProgress) onProgress(data);
+        if (data.status === 'done' || data.status === 'failed') {
+            return data;
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+}
+
+function updateLoadingMessage(job) {
+    const text = document.querySelector('#loading p');
+    if (text && job.message) {
+        text.textContent = job.message + '...';
+    }
+}
+
 function showLoading(show) {
     const loading = document.getElementById('loading');
     const btn = document.getElementById('generateBtn');
     
     if (show) {
+        loading.querySelector('p').textContent = 'Processing with AI...';
         loading.classList.remove('hidden');
         btn.disabled = true;
     } else {
@@ -3,15 +3,35 @@ let cards = [];
 let currentCardIndex = 0;
 let isFlipped = false;
 
+// Due cards are fetched a page at a time as the session progresses
+const PAGE_SIZE = 20;
+const PREFETCH_THRESHOLD = 5;
+let nextCursor = null;
+let totalDue = 0;
+let pageRequest = null;
+
+// Ratings are buffered and sent to the server in batches
+const REVIEW_FLUSH_SIZE = 10;
+let pendingReviews = [];
+
 document.addEventListener('DOMContentLoaded', () => {
     loadCards();
     setupKeyboardShortcuts();
+    
+    // Ask the service worker to replay any reviews queued while offline
+    if ('serviceWorker' in navigator && navigator.serviceWorker.controller) {
+        navigator.serviceWorker.controller.postMessage('flush-reviews');
+    }
+});
+
+// Send whatever is still buffered when the user leaves the page
+window.addEventListener('pagehide', () => {
+    flushReviews(true);
 });
 
 async function loadCards() {
     try {
-        const response = await fetch(`/api/decks/${DECK_ID}/due-cards`);
-        cards = await response.json();
+        await loadNextPage();
         
         if (cards.length === 0) {
             document.getElementById('noCards').classList.remove('hidden');
@@ -26,8 +46,48 @@ async function loadCards() {
     }
 }
 
-function showCard(index) {
+function loadNextPage() {
+    // Share one in-flight request between prefetch and on-demand loads
+    if (!pageRequest) {
+        pageRequest = fetchDuePage().finally(() => {
+            pageRequest = null;
+        });
+    }
+    return pageRequest;
+}
+
+async function fetchDuePage() {
+    let url = `/api/decks/${DECK_ID}/due-cards?limit=${PAGE_SIZE}`;
+    if (nextCursor) {
+        url += `&after=${encodeURIComponent(nextCursor)}`;
+    }
+    
+    const response = await fetch(url);
+    const data = await response.json();
+    
+    if (!response.ok) {
+        throw new Error(data.error || 'Failed to load cards');
+    }
+    
+    if (data.due_count !== undefined) {
+        totalDue = data.due_count;
+    }
+    cards = cards.concat(data.cards);
+    nextCursor = data.next_cursor;
+}
+
+async function showCard(index) {
+    if (index >= cards.length && nextCursor) {
+        try {
+            await loadNextPage();
+        } catch (error) {
+            showMessage('Error loading cards: ' + error.message, 'error');
+            return;
+        }
+    }
+    
     if (index >= cards.length) {
+        flushReviews();
         document.getElementById('flashcard').classList.add('hidden');
         document.getElementById('noCards').classList.remove('hidden');
         document.getElementById('noCards').innerHTML = `
@@ -38,6 +98,11 @@ function showCard(index) {
         return;
     }
     
+    // Fetch the next page before the user runs out of cards
+    if (nextCursor && cards.length - index <= PREFETCH_THRESHOLD) {
+        loadNextPage().catch(() => {});
+    }
+    
     const card = cards[index];
     currentCardIndex = index;
     isFlipped = false;
@@ -60,30 +125,63 @@ function flipCard() {
     }
 }
 
-async function rateCard(quality) {
+function rateCard(quality) {
     const card = cards[currentCardIndex];
     
+    pendingReviews.push({
+        card_id: card.id,
+        quality,
+        reviewed_at: new Date().toISOString()
+    });
+    
+    if (pendingReviews.length >= REVIEW_FLUSH_SIZE) {
+        flushReviews();
+    }
+    
+    showCard(currentCardIndex + 1);
+}
+
+async function flushReviews(keepalive = false) {
+    if (pendingReviews.length === 0) return;
+    
+    const reviews = pendingReviews;
+    pendingReviews = [];
+    
     try {
-        const response = await fetch(`/api/study/${card.id}`, {
+        const response = await fetch('/api/study/batch', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ quality })
+            body: JSON.stringify({ reviews }),
+            keepalive
         });
         
-        const data = await response.json();
+        if (response.status >= 500) {
+            // The server may be busy (e.g. a locked database); retry these later
+            pendingReviews = reviews.concat(pendingReviews);
+            showMessage('Error recording study session, will retry', 'error');
+            return;
+        }
+        
+        const data = await response.json().catch(() => ({}));
+        
+        if (!response.ok) {
+            // Rejected as invalid; sending the same batch again would not help
+            showMessage(data.error || 'Error recording study session', 'error');
+            return;
+        }
         
         if (data.badges_earned && data.badges_earned.length > 0) {
             showBadgeModal(data.badges_earned);
         }
-        
-        showCard(currentCardIndex + 1);
     } catch (error) {
+        // Keep the reviews so the next flush retries them
+        pendingReviews = reviews.concat(pendingReviews);
         showMessage('Error recording study session: ' + error.message, 'error');
     }
 }
 
 function updateProgress() {
-    const total = cards.length;
+    const total = Math.max(totalDue, cards.length);
     const current = Math.min(currentCardIndex + 1, total);
     const percentage = total > 0 ? (currentCardIndex / total) * 100 : 0;
     
@@ -1,4 +1,4 @@
-const CACHE_NAME = 'flashcards-v2';
+const CACHE_NAME = 'flashcards-v5';
 const urlsToCache = [
   '/',
   '/static/css/style.css',
@@ -18,7 +18,174 @@ self.addEventListener('install', event => {
   );
 });
 
+// Study reviews that could not reach the server are kept in IndexedDB and
+// replayed through /api/study/batch once the network is back
+const REVIEW_QUEUE_DB = 'flashcards-offline';
+const REVIEW_QUEUE_STORE = 'pending-reviews';
+
+function openReviewQueue() {
+  return new Promise((resolve, reject) => {
+    const request = indexedDB.open(REVIEW_QUEUE_DB, 1);
+    request.onupgradeneeded = () => {
+      request.result.createObjectStore(REVIEW_QUEUE_STORE, { autoIncrement: true });
+    };
+    request.onsuccess = () => resolve(request.result);
+    request.onerror = () => reject(request.error);
+  });
+}
+
+async function queueReviews(reviews) {
+  const db = await openReviewQueue();
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(REVIEW_QUEUE_STORE, 'readwrite');
+    tx.objectStore(REVIEW_QUEUE_STORE).add(reviews);
+    tx.oncomplete = () => resolve();
+    tx.onerror = () => reject(tx.error);
+  });
+}
+
+// /api/study/batch rejects requests with more reviews than this
+const MAX_BATCH_REVIEWS = 500;
+
+function removeQueuedReviews(db, keys, remainder) {
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(REVIEW_QUEUE_STORE, 'readwrite');
+    const store = tx.objectStore(REVIEW_QUEUE_STORE);
+    keys.forEach(key => store.delete(key));
+    if (remainder) store.put(remainder.reviews, remainder.key);
+    tx.oncomplete = () => resolve();
+    tx.onerror = () => reject(tx.error);
+  });
+}
+
+async function sendQueuedReviews() {
+  const db = await openReviewQueue();
+  const queued = await new Promise((resolve, reject) => {
+    const tx = db.transaction(REVIEW_QUEUE_STORE, 'readonly');
+    const store = tx.objectStore(REVIEW_QUEUE_STORE);
+    const keys = store.getAllKeys();
+    const values = store.getAll();
+    tx.oncomplete = () => resolve({ keys: keys.result, values: values.result });
+    tx.onerror = () => reject(tx.error);
+  });
+
+  // Send the queue in slices the server accepts, dropping each slice from
+  // the queue only once it has been handled, so a failure part way through
+  // never replays or loses reviews
+  let index = 0;
+  while (index < queued.keys.length) {
+    const reviews = [];
+    const sentKeys = [];
+    let remainder = null;
+
+    while (index < queued.keys.length) {
+      const entry = queued.values[index];
+      const room = MAX_BATCH_REVIEWS - reviews.length;
+      if (entry.length <= room) {
+        reviews.push(...entry);
+        sentKeys.push(queued.keys[index]);
+        index++;
+      } else {
+        // An entry larger than a whole slice is sent in parts
+        if (reviews.length === 0) {
+          reviews.push(...entry.slice(0, room));
+          remainder = { key: queued.keys[index], reviews: entry.slice(room) };
+          queued.values[index] = remainder.reviews;
+        }
+        break;
+      }
+    }
+
+    const response = await fetch('/api/study/batch', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ reviews })
+    });
+
+    // Server errors are retried later; rejected (4xx) slices would never succeed
+    if (response.status >= 500) return;
+
+    await removeQueuedReviews(db, sentKeys, remainder);
+  }
+}
+
+// The sync and message handlers can fire together; they share one flush so
+// the same reviews are never sent twice
+let flushInFlight = null;
+
+function flushQueuedReviews() {
+  if (!flushInFlight) {
+    flushInFlight = sendQueuedReviews().finally(() => {
+      flushInFlight = null;
+    });
+  }
+  return flushInFlight;
+}
+
+async function handleReviewBatch(request) {
+  const body = await request.clone().json();
+
+  try {
+    return await fetch(request);
+  } catch (error) {
+    await queueReviews(body.reviews || []);
+    if (self.registration.sync) {
+      self.registration.sync.register('flush-reviews').catch(() => {});
+    }
+    return new Response(JSON.stringify({
+      message: 'Study sessions queued until back online',
+      queued: (body.reviews || []).length,
+      badges_earned: []
+    }), { status: 202, headers: { 'Content-Type': 'application/json' } });
+  }
+}
+
+// Pages reference static files by fingerprinted URL (?v=<content hash>), so a
+// cached copy of one of those URLs is always current
+async function handleStaticRequest(request) {
+  const cache = await caches.open(CACHE_NAME);
+  const cached = await cache.match(request);
+  if (cached) return cached;
+
+  try {
+    const response = await fetch(request);
+    if (response.ok && new URL(request.url).searchParams.has('v')) {
+      cache.put(request, response.clone());
+    }
+    return response;
+  } catch (error) {
+    // Offline: fall back to any cached version of the file
+    const fallback = await cache.match(request, { ignoreSearch: true });
+    if (fallback) return fallback;
+    throw error;
+  }
+}
+
+self.addEventListener('sync', (event) => {
+  if (event.tag === 'flush-reviews') {
+    event.waitUntil(flushQueuedReviews());
+  }
+});
+
+self.addEventListener('message', (event) => {
+  if (event.data === 'flush-reviews') {
+    event.waitUntil(flushQueuedReviews().catch(() => {}));
+  }
+});
+
 self.addEventListener('fetch', (event) => {
+  const url = new URL(event.request.url);
+
+  if (event.request.method === 'POST' && url.pathname === '/api/study/batch') {
+    event.respondWith(handleReviewBatch(event.request));
+    return;
+  }
+
+  if (event.request.method === 'GET' && url.pathname.startsWith('/static/')) {
+    event.respondWith(handleStaticRequest(event.request));
+    return;
+  }
+
   // Don't cache navigation requests (HTML pages)
   if (event.request.mode === 'navigate') {
     event.respondWith(fetch(event.request));
@@ -0,0 +1,102 @@
+"""
+Check that the hot read queries are planned against their indexes
+
+Each model call runs against a freshly migrated temporary database with its
+SQL traced, and every SELECT it issued is run again under EXPLAIN QUERY PLAN.
+"""
+import pytest
+
+import models
+from cache import cache
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(models, 'DATABASE', str(tmp_path / 'flashcards.db'))
+    monkeypatch.setattr(models, '_local', models.threading.local())
+    cache.clear()
+    models.init_db()
+
+    deck_ids = [models.Deck.create(f'Deck {i}') for i in range(3)]
+    for deck_id in deck_ids:
+        models.Card.create_many(deck_id, [
+            {'question': f'Question {i}', 'answer': f'Answer {i}'} for i in range(20)
+        ])
+        models.QuizResult.save(deck_id, 8, 10)
+
+    conn = models.get_db()
+    yield conn, deck_ids[0]
+    conn.close()
+    cache.clear()
+
+@pytest.fixture
+def scheduled_db(db):
+    """db with a realistic schedule: one card in twenty due, the rest over the next two months"""
+    conn, deck_id = db
+    models.Card.create_many(deck_id, [
+        {'question': f'Scheduled {i}', 'answer': f'Answer {i}'} for i in range(500)
+    ])
+    conn.execute('''
+        UPDATE study_sessions SET next_review = datetime('now', '+' || (id % 60 + 1) || ' days')
+        WHERE id % 20 != 0
+    ''')
+    conn.execute('ANALYZE')
+    conn.commit()
+    return conn, deck_id
+
+def query_plans(conn, call):
+    """Run call() and return the EXPLAIN QUERY PLAN details of each SELECT it made"""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+
+    plans = []
+    for sql in statements:
+        if sql.lstrip().upper().startswith('SELECT'):
+            rows = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+            plans.append(' | '.join(row['detail'] for row in rows))
+    assert plans, 'no SELECT was traced'
+    return plans
+
+def assert_uses_index(plans, index):
+    assert any(f'USING INDEX {index}' in plan or f'USING COVERING INDEX {index}' in plan
+               for plan in plans), plans
+
+def test_cards_by_deck_uses_deck_index(db):
+    conn, deck_id = db
+    plans = query_plans(conn, lambda: models.Card.get_by_deck(deck_id))
+    assert_uses_index(plans, 'idx_cards_deck_created')
+    assert_uses_index(plans, 'idx_study_sessions_card')
+
+def test_due_cards_use_deck_and_session_indexes(db):
+    conn, deck_id = db
+    plans = query_plans(conn, lambda: models.Card.get_due_cards(deck_id))
+    assert_uses_index(plans, 'idx_cards_deck_created')
+    assert_uses_index(plans, 'idx_study_sessions_card')
+
+def test_quiz_results_by_deck_use_deck_index(db):
+    conn, deck_id = db
+    plans = query_plans(conn, lambda: models.QuizResult.get_by_deck(deck_id))
+    assert_uses_index(plans, 'idx_quiz_results_deck_completed')
+
+def test_review_queue_uses_next_review_index(scheduled_db):
+    conn, deck_id = scheduled_db
+    plans = query_plans(conn, lambda: models.Card.get_due_page(deck_id, 20))
+    assert_uses_index(plans, 'idx_study_sessions_next_review')
+
+    cursor = models.encode_cursor('2000-01-01 00:00:00', 0)
+    plans = query_plans(conn, lambda: models.Card.get_due_page(deck_id, 20, cursor))
+    assert_uses_index(plans, 'idx_study_sessions_next_review')
+
+def test_due_today_count_uses_next_review_index(scheduled_db):
+    conn, deck_id = scheduled_db
+    plans = query_plans(conn, models.StudySession.get_stats)
+    assert_uses_index(plans, 'idx_study_sessions_next_review')
+
+def test_deck_list_reads_stats_without_scanning_cards(db):
+    conn, deck_id = db
+    plans = query_plans(conn, models.Deck.get_all)
+    assert_uses_index(plans, 'idx_decks_created')
+    assert not any('cards' in plan for plan in plans), plans
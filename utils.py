@@ -1,26 +1,277 @@
 import os
+import time
+import logging
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import wait
+from concurrent.futures.process import BrokenProcessPool
 from PyPDF2 import PdfReader
 import pdfplumber
 from PIL import Image
 import pytesseract
 import io
+from werkzeug.exceptions import RequestEntityTooLarge
+from process_pool import create_process_pool
 
-def extract_text_from_pdf(file_path):
-    """Extract text from PDF using multiple methods"""
+logger = logging.getLogger(__name__)
+
+# Worker processes for PDF extraction; pdfplumber and Tesseract are CPU-bound
+PDF_MAX_WORKERS = int(os.environ.get('PDF_MAX_WORKERS', min(4, os.cpu_count() or 1)))
+# Pages handed to a worker at once, so each worker parses the file once per batch
+PDF_PAGES_PER_TASK = int(os.environ.get('PDF_PAGES_PER_TASK', 8))
+# Wall-clock budget in seconds for one document; pages not done by then are skipped
+PDF_TIME_BUDGET = float(os.environ.get('PDF_TIME_BUDGET', 120))
+# Pages with less embedded text than this are OCR'd if they contain images
+PDF_MIN_PAGE_CHARS = int(os.environ.get('PDF_MIN_PAGE_CHARS', 50))
+# Resolution pages are rendered at for OCR
+PDF_OCR_DPI = int(os.environ.get('PDF_OCR_DPI', 300))
+# Memory for rendered pages kept by each worker process
+PDF_RASTER_CACHE_MB = int(os.environ.get('PDF_RASTER_CACHE_MB', 64))
+
+# Uploads up to this size are kept in memory and never written to disk
+UPLOAD_SPOOL_BYTES = int(os.environ.get('UPLOAD_SPOOL_BYTES', 4 * 1024 * 1024))
+
+class UploadBuffer:
+    """
+    Seekable, writable holder for an uploaded file
+
+    Data is kept in memory until it grows past spool_bytes, then moved to a
+    named file in `directory` so extraction workers can open it by path.
+    Writing more than max_bytes raises RequestEntityTooLarge as soon as the
+    limit is crossed, without reading the rest of the upload. The SHA-256 of
+    the contents is computed as the data is written.
+    """
+
+    def __init__(self, spool_bytes, directory, max_bytes, suffix=''):
+        self.spool_bytes = spool_bytes
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.size = 0
+        self.path = None
+        self._file = io.BytesIO()
+        self._owned = True
+        self._hash = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge()
+        if self.path is None and self.size > self.spool_bytes:
+            self._roll_over()
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def _roll_over(self):
+        spooled = self._file.getvalue()
+        self._file = tempfile.NamedTemporaryFile(dir=self.directory, suffix=self.suffix, delete=False)
+        self.path = self._file.name
+        self._file.write(spooled)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    @property
+    def source(self):
+        """What the extractors accept: the bytes in memory, or the file path"""
+        if self.path is None:
+            return self._file.getvalue()
+        self._file.flush()
+        return self.path
+
+    def detach(self):
+        """Return source and hand ownership of any file on disk to the caller"""
+        source = self.source
+        self._owned = False
+        return source
+
+    def close(self):
+        self._file.close()
+        if self.path and self._owned and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # read, seek, tell, readline etc. come from the underlying file
+        return getattr(self._file, name)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = create_process_pool(PDF_MAX_WORKERS)
+        return _pool
+
+def _discard_pool(pool, cancel_futures=True):
+    """Stop handing out pool; queued work on it is cancelled unless cancel_futures is False"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=cancel_futures)
+
+def _open_source(source):
+    """PDF sources are either a file path or the file's bytes"""
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+def count_pages(source):
+    with pdfplumber.open(_open_source(source)) as pdf:
+        return len(pdf.pages)
+
+def file_fingerprint(source):
+    """Cheap identity for a file's contents, used to key cached page images"""
+    if isinstance(source, bytes):
+        return hashlib.sha1(source).hexdigest()
+    stat = os.stat(source)
+    return (os.path.abspath(source), stat.st_size, stat.st_mtime_ns)
+
+class RasterCache:
+    """
+    Per-process LRU of rasterized pages, bounded by total pixel bytes
+
+    Lets a retried or repeated extraction in the same worker skip
+    re-rendering pages it has already rasterized.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._images = OrderedDict()
+        self._size = 0
+
+    def get(self, key):
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        size = image.width * image.height * len(image.getbands())
+        if size > self.max_bytes:
+            return
+        old = self._images.pop(key, None)
+        if old is not None:
+            self._size -= old.width * old.height * len(old.getbands())
+        self._images[key] = image
+        self._size += size
+        while self._size > self.max_bytes:
+            _, evicted = self._images.popitem(last=False)
+            self._size -= evicted.width * evicted.height * len(evicted.getbands())
+
+_raster_cache = RasterCache(PDF_RASTER_CACHE_MB * 1024 * 1024)
+
+def rasterize_page(page, fingerprint, dpi=PDF_OCR_DPI):
+    """Render a page to a grayscale image for OCR, reusing cached renders"""
+    key = (fingerprint, page.page_number, dpi)
+    image = _raster_cache.get(key)
+    if image is None:
+        image = page.to_image(resolution=dpi).original.convert('L')
+        _raster_cache.put(key, image)
+    return image
+
+def needs_ocr(page, page_text):
+    """A page needs OCR when it has images but too little extractable text"""
+    return len(page_text.strip()) < PDF_MIN_PAGE_CHARS and bool(page.images)
+
+def _extract_page_range(source, start, stop, dpi=PDF_OCR_DPI):
+    """
+    Worker: extract the text of pages [start, stop) in a single pass
+
+    Pages with enough embedded text use it directly; pages that look scanned
+    are rasterized at `dpi` and OCR'd instead.
+    """
+    fingerprint = file_fingerprint(source)
+    texts = []
+    with pdfplumber.open(_open_source(source)) as pdf:
+        for page in pdf.pages[start:stop]:
+            try:
+                page_text = page.extract_text() or ''
+            except Exception as e:
+                print(f"pdfplumber error on page {page.page_number}: {e}")
+                page_text = ''
+            
+            if needs_ocr(page, page_text):
+                try:
+                    ocr_text = pytesseract.image_to_string(rasterize_page(page, fingerprint, dpi))
+                    # The OCR of the whole page includes any sparse embedded text
+                    if len(ocr_text.strip()) > len(page_text.strip()):
+                        page_text = ocr_text
+                except Exception as e:
+                    print(f"OCR error on page {page.page_number}: {e}")
+            
+            texts.append(page_text)
+    return texts
+
+def map_pages(worker, source, page_count, deadline):
+    """
+    Run worker(source, start, stop) over batches of pages in parallel
+
+    Returns one entry per page in page order; pages whose batch failed or
+    did not finish before the deadline are None.
+    """
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    pages = [None] * page_count
+
+    if len(ranges) <= 1 or PDF_MAX_WORKERS <= 1:
+        # Not worth a round trip through the pool
+        for start, stop in ranges:
+            if time.monotonic() >= deadline:
+                break
+            pages[start:stop] = worker(source, start, stop)
+        return pages
+
+    pool = _get_pool()
+    try:
+        futures = {pool.submit(worker, source, start, stop): (start, stop)
+                   for start, stop in ranges}
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+
+    done, not_done = wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    # Batches that haven't started are dropped. Running ones can't be
+    # stopped, so their pool is left to finish them (and other documents'
+    # work) while later documents start on a fresh pool instead of queueing
+    # behind them.
+    running = [future for future in not_done if not future.cancel()]
+    if running:
+        _discard_pool(pool, cancel_futures=False)
+    if not_done:
+        logger.warning("PDF extraction time budget exceeded, skipped %d of %d page batches",
+                       len(not_done), len(ranges))
+
+    for future in done:
+        start, stop = futures[future]
+        try:
+            pages[start:stop] = future.result()
+        except BrokenProcessPool:
+            _discard_pool(pool)
+        except Exception as e:
+            print(f"Error extracting pages {start + 1}-{stop}: {e}")
+    return pages
+
+def _join_pages(pages):
+    return "".join(text + "\n" for text in pages if text).strip()
+
+def extract_text_from_pdf(source, deadline=None):
+    """Extract text from PDF, OCRing pages that have no usable embedded text"""
+    if deadline is None:
+        deadline = time.monotonic() + PDF_TIME_BUDGET
     text = ""
     
     try:
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+        text = _join_pages(map_pages(_extract_page_range, source, count_pages(source), deadline))
     except Exception as e:
         print(f"pdfplumber error: {e}")
     
     if not text.strip():
         try:
-            reader = PdfReader(file_path)
+            reader = PdfReader(_open_source(source))
             for page in reader.pages:
                 page_text = page.extract_text()
                 if page_text:
@@ -30,43 +281,9 @@ def extract_text_from_pdf(file_path):
     
     return text.strip()
 
-def extract_text_from_images_in_pdf(file_path):
-    """Extract text from images in PDF using OCR"""
-    text = ""
-    
-    try:
-        with pdfplumber.open(file_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                images = page.images
-                
-                for img in images:
-                    try:
-                        bbox = (img['x0'], img['top'], img['x1'], img['bottom'])
-                        page_image = page.within_bbox(bbox).to_image()
-                        
-                        pil_image = page_image.original
-                        
-                        ocr_text = pytesseract.image_to_string(pil_image)
-                        if ocr_text.strip():
-                            text += ocr_text + "\n"
-                    except Exception as img_error:
-                        print(f"Error processing image on page {page_num}: {img_error}")
-                        continue
-    except Exception as e:
-        print(f"OCR extraction error: {e}")
-    
-    return text.strip()
-
-def process_pdf_file(file_path):
-    """Process PDF file with text extraction and OCR"""
-    text = extract_text_from_pdf(file_path)
-    
-    if not text or len(text) < 100:
-        ocr_text = extract_text_from_images_in_pdf(file_path)
-        if ocr_text:
-            text = text + "\n" + ocr_text if text else ocr_text
-    
-    return text
+def process_pdf_file(source):
+    """Process a PDF, given as a file path or its bytes, with text extraction and OCR"""
+    return extract_text_from_pdf(source)
 
 def allowed_file(filename):
     """Check if file extension is allowed"""